@@ -10,23 +10,42 @@ Graceful degradation: if mediapipe is not installed, returns empty results.
 
 from __future__ import annotations
 
+import atexit
 import logging
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable
 from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
 
 import numpy as np
 from numpy.typing import NDArray
 
-from backend.config import FACE_BBOX_PADDING
+from backend.config import (
+    FACE_BBOX_PADDING,
+    FACE_DETECT_MAX_DIM,
+    FACE_MODEL_QUANTIZED,
+)
 
 logger = logging.getLogger("ninyrawatermark.ai_detection")
 
-# Model file path — bundled alongside this module
-_MODEL_PATH = Path(__file__).parent / "blaze_face_short_range.tflite"
+# Model file paths — bundled alongside this module. The int8-quantized
+# variant runs on XNNPACK's integer kernels; fp32 remains the fallback.
+_MODEL_DIR = Path(__file__).parent
+_MODEL_PATH_FP32 = _MODEL_DIR / "blaze_face_short_range.tflite"
+_MODEL_PATH_INT8 = _MODEL_DIR / "blaze_face_short_range_int8.tflite"
+_MODEL_PATH = (
+    _MODEL_PATH_INT8
+    if FACE_MODEL_QUANTIZED and _MODEL_PATH_INT8.exists()
+    else _MODEL_PATH_FP32
+)
 
 # Try to import mediapipe — graceful degradation
 _MEDIAPIPE_AVAILABLE = False
 try:
+    import cv2
     import mediapipe as mp
     if _MODEL_PATH.exists():
         _MEDIAPIPE_AVAILABLE = True
@@ -41,8 +60,61 @@ except ImportError:
         "Install: pip install mediapipe"
     )
 
+# Cached detector — building it parses the tflite model and sets up the
+# XNNPACK delegate, which costs more than a single inference.
+# FaceDetector in IMAGE mode is not thread-safe, so detect() is serialized.
+_detector: "mp.tasks.vision.FaceDetector | None" = None
+_detector_lock = threading.Lock()
+
+
+def _get_detector() -> "mp.tasks.vision.FaceDetector":
+    """Return the shared FaceDetector, creating it on first use."""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                base_options = mp.tasks.BaseOptions(
+                    model_asset_path=str(_MODEL_PATH)
+                )
+                options = mp.tasks.vision.FaceDetectorOptions(
+                    base_options=base_options,
+                    min_detection_confidence=0.5,
+                )
+                _detector = mp.tasks.vision.FaceDetector.create_from_options(options)
+                logger.info("MediaPipe FaceDetector initialized (%s)", _MODEL_PATH.name)
+    return _detector
+
+
+def warm_up() -> None:
+    """Build the detector and run one dummy inference ahead of requests."""
+    if not _MEDIAPIPE_AVAILABLE:
+        return
+    try:
+        detector = _get_detector()
+        mp_image = mp.Image(
+            image_format=mp.ImageFormat.SRGB,
+            data=np.zeros((128, 128, 3), dtype=np.uint8),
+        )
+        with _detector_lock:
+            detector.detect(mp_image)
+        logger.info("MediaPipe FaceDetector warmed up")
+    except Exception as exc:
+        logger.warning("FaceDetector warm-up failed: %s", exc)
+
 
-@dataclass(frozen=True)
+@atexit.register
+def _close_detector() -> None:
+    """Release the cached detector on interpreter shutdown."""
+    global _detector
+    if _detector is not None:
+        try:
+            _detector.close()
+        except Exception as exc:
+            logger.warning("Failed to close FaceDetector: %s", exc)
+        _detector = None
+
+
+@dataclass(frozen=True, slots=True)
 class FaceBBox:
     """A single detected face bounding box (pixel coordinates)."""
     x_min: int
@@ -52,6 +124,19 @@ class FaceBBox:
     confidence: float
 
 
+# Face bboxes as four int32 columns: (x_min, y_min, x_max, y_max)
+FaceColumns = tuple[NDArray[np.int32], NDArray[np.int32], NDArray[np.int32], NDArray[np.int32]]
+
+
+def face_columns(faces: list[FaceBBox]) -> FaceColumns:
+    """Convert a list of face bboxes into struct-of-arrays int32 columns."""
+    boxes = np.array(
+        [(f.x_min, f.y_min, f.x_max, f.y_max) for f in faces],
+        dtype=np.int32,
+    ).reshape(-1, 4)
+    return boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+
+
 @dataclass
 class DetectionResult:
     """Result of face detection on an image."""
@@ -60,6 +145,23 @@ class DetectionResult:
     image_height: int = 0
     mediapipe_available: bool = _MEDIAPIPE_AVAILABLE
 
+    @cached_property
+    def face_columns(self) -> FaceColumns:
+        """Face bboxes as int32 columns, built once per result."""
+        return face_columns(self.faces)
+
+
+def _as_rgb(image_array: NDArray[np.uint8]) -> NDArray[np.uint8]:
+    """Return a C-contiguous (H, W, 3) array, copying only when required.
+
+    MediaPipe does not mutate its input, so a contiguous RGB array (what
+    the API layer produces) is passed through as-is. RGBA drops alpha,
+    grayscale is expanded.
+    """
+    if image_array.ndim == 2:
+        return cv2.cvtColor(image_array, cv2.COLOR_GRAY2RGB)
+    return np.ascontiguousarray(image_array[..., :3])
+
 
 def detect_faces(image_array: NDArray[np.uint8]) -> DetectionResult:
     """Run MediaPipe face detection on an image array (RGB or RGBA)."""
@@ -72,63 +174,63 @@ def detect_faces(image_array: NDArray[np.uint8]) -> DetectionResult:
             mediapipe_available=False,
         )
 
-    # Convert RGBA to RGB if needed
-    if len(image_array.shape) == 3 and image_array.shape[2] == 4:
-        rgb = image_array[:, :, :3].copy()
-    elif len(image_array.shape) == 3:
-        rgb = image_array.copy()
-    else:
-        rgb = np.stack([image_array] * 3, axis=-1)
+    rgb = _as_rgb(image_array)
+    assert rgb.shape[2] == 3 and rgb.flags["C_CONTIGUOUS"]
 
     h, w = rgb.shape[:2]
     faces: list[FaceBBox] = []
 
-    try:
-        base_options = mp.tasks.BaseOptions(
-            model_asset_path=str(_MODEL_PATH)
-        )
-        options = mp.tasks.vision.FaceDetectorOptions(
-            base_options=base_options,
-            min_detection_confidence=0.5,
+    # The short-range model works on 128x128 input, so large images are
+    # downscaled here and the boxes mapped back to original pixels.
+    inv_scale = 1.0
+    if max(h, w) > FACE_DETECT_MAX_DIM:
+        scale = FACE_DETECT_MAX_DIM / max(h, w)
+        inv_scale = 1.0 / scale
+        rgb = cv2.resize(
+            rgb, (int(w * scale), int(h * scale)),
+            interpolation=cv2.INTER_AREA,
         )
 
-        with mp.tasks.vision.FaceDetector.create_from_options(options) as detector:
-            mp_image = mp.Image(
-                image_format=mp.ImageFormat.SRGB,
-                data=rgb,
-            )
+    try:
+        detector = _get_detector()
+        mp_image = mp.Image(
+            image_format=mp.ImageFormat.SRGB,
+            data=rgb,
+        )
+        with _detector_lock:
             result = detector.detect(mp_image)
 
-            for detection in result.detections:
-                bbox = detection.bounding_box
-                confidence = detection.categories[0].score if detection.categories else 0.0
-
-                x_min = bbox.origin_x
-                y_min = bbox.origin_y
-                box_w = bbox.width
-                box_h = bbox.height
-
-                # Expand by FACE_BBOX_PADDING (15%) on all sides
-                pad_x = int(box_w * FACE_BBOX_PADDING)
-                pad_y = int(box_h * FACE_BBOX_PADDING)
-
-                x_min_exp = max(0, x_min - pad_x)
-                y_min_exp = max(0, y_min - pad_y)
-                x_max_exp = min(w, x_min + box_w + pad_x)
-                y_max_exp = min(h, y_min + box_h + pad_y)
-
-                faces.append(FaceBBox(
-                    x_min=x_min_exp,
-                    y_min=y_min_exp,
-                    x_max=x_max_exp,
-                    y_max=y_max_exp,
+        detections = result.detections
+        if detections:
+            # (N, 4) origin_x, origin_y, width, height in original pixels
+            boxes = (np.array(
+                [
+                    (d.bounding_box.origin_x, d.bounding_box.origin_y,
+                     d.bounding_box.width, d.bounding_box.height)
+                    for d in detections
+                ],
+                dtype=np.float64,
+            ) * inv_scale).astype(np.int32)
+            confidences = [
+                d.categories[0].score if d.categories else 0.0
+                for d in detections
+            ]
+
+            # Expand by FACE_BBOX_PADDING (15%) on all sides
+            pads = (boxes[:, 2:4] * FACE_BBOX_PADDING).astype(np.int32)
+            mins = np.maximum(0, boxes[:, 0:2] - pads)
+            maxs = np.minimum((w, h), boxes[:, 0:2] + boxes[:, 2:4] + pads)
+
+            faces = [
+                FaceBBox(
+                    x_min=x_min, y_min=y_min, x_max=x_max, y_max=y_max,
                     confidence=confidence,
-                ))
-
-                logger.info(
-                    "Face detected: bbox=(%d,%d,%d,%d) confidence=%.3f",
-                    x_min_exp, y_min_exp, x_max_exp, y_max_exp, confidence,
                 )
+                for (x_min, y_min), (x_max, y_max), confidence in zip(
+                    mins.tolist(), maxs.tolist(), confidences,
+                )
+            ]
+            logger.debug("Padded face bboxes: mins=%s maxs=%s", mins, maxs)
 
     except Exception as exc:
         logger.error("MediaPipe face detection failed: %s", exc, exc_info=True)
@@ -137,6 +239,73 @@ def detect_faces(image_array: NDArray[np.uint8]) -> DetectionResult:
     return DetectionResult(faces=faces, image_width=w, image_height=h)
 
 
+def detect_faces_batch(
+    image_arrays: Iterable[NDArray[np.uint8]],
+) -> list[DetectionResult]:
+    """Run face detection on several images, results in input order.
+
+    Inference is serialized on the shared detector, so images are handled
+    one at a time. A lazy iterable keeps only the current image in memory.
+    """
+    return [detect_faces(image_array) for image_array in image_arrays]
+
+
+# Recently detected faces, keyed by the faces_id token handed to the client.
+# Lets preview/export reuse server-side FaceBBox lists instead of rebuilding
+# them from JSON on every settings tweak.
+_FACES_CACHE_SIZE = 128
+_faces_cache: OrderedDict[str, list[FaceBBox]] = OrderedDict()
+_faces_cache_lock = threading.Lock()
+
+
+def remember_faces(faces: list[FaceBBox]) -> str:
+    """Store detected faces and return a token to reference them later."""
+    faces_id = uuid.uuid4().hex
+    with _faces_cache_lock:
+        _faces_cache[faces_id] = faces
+        while len(_faces_cache) > _FACES_CACHE_SIZE:
+            _faces_cache.popitem(last=False)
+    return faces_id
+
+
+def recall_faces(faces_id: str | None) -> list[FaceBBox] | None:
+    """Return faces stored under ``faces_id``, or None if unknown/evicted."""
+    if not faces_id:
+        return None
+    with _faces_cache_lock:
+        faces = _faces_cache.get(faces_id)
+        if faces is not None:
+            _faces_cache.move_to_end(faces_id)
+        return faces
+
+
+def faces_from_payload(raw: list[dict[str, float]]) -> list[FaceBBox]:
+    """Rebuild FaceBBox objects from their JSON representation."""
+    return [
+        FaceBBox(
+            x_min=f["x_min"], y_min=f["y_min"],
+            x_max=f["x_max"], y_max=f["y_max"],
+            confidence=f.get("confidence", 0.0),
+        )
+        for f in raw
+    ]
+
+
+def detection_to_dict(detection: DetectionResult) -> dict[str, object]:
+    """Serialize a DetectionResult for API responses."""
+    return {
+        "faces": [{
+            "x_min": f.x_min, "y_min": f.y_min,
+            "x_max": f.x_max, "y_max": f.y_max,
+            "confidence": round(f.confidence, 3),
+        } for f in detection.faces],
+        "exclusion_zones": get_face_exclusion_zones(detection),
+        "mediapipe_available": detection.mediapipe_available,
+        "image_width": detection.image_width,
+        "image_height": detection.image_height,
+    }
+
+
 def get_face_exclusion_zones(
     detection: DetectionResult,
 ) -> list[dict[str, float]]:
@@ -144,15 +313,18 @@ def get_face_exclusion_zones(
     if detection.image_width == 0 or detection.image_height == 0:
         return []
 
-    zones: list[dict[str, float]] = []
-    for face in detection.faces:
-        zones.append({
-            "x_min": face.x_min / detection.image_width,
-            "y_min": face.y_min / detection.image_height,
-            "x_max": face.x_max / detection.image_width,
-            "y_max": face.y_max / detection.image_height,
-            "confidence": face.confidence,
-        })
+    if not detection.faces:
+        return []
+
+    coords = np.array(
+        [(f.x_min, f.y_min, f.x_max, f.y_max, f.confidence) for f in detection.faces],
+        dtype=np.float64,
+    )
+    w, h = detection.image_width, detection.image_height
+    coords /= np.array([w, h, w, h, 1.0])
+
+    keys = ("x_min", "y_min", "x_max", "y_max", "confidence")
+    zones: list[dict[str, float]] = [dict(zip(keys, row)) for row in coords.tolist()]
     return zones
 
 
@@ -161,11 +333,13 @@ def is_zone_overlapping_faces(
     zone_y: int,
     zone_w: int,
     zone_h: int,
-    faces: list[FaceBBox],
+    faces: list[FaceBBox] | FaceColumns,
 ) -> bool:
     """Check if a rectangle overlaps with any detected face bbox."""
-    for face in faces:
-        if (zone_x < face.x_max and zone_x + zone_w > face.x_min and
-                zone_y < face.y_max and zone_y + zone_h > face.y_min):
-            return True
-    return False
+    if isinstance(faces, list):
+        faces = face_columns(faces)
+    x_min, y_min, x_max, y_max = faces
+    return bool(np.any(
+        (zone_x < x_max) & (zone_x + zone_w > x_min)
+        & (zone_y < y_max) & (zone_y + zone_h > y_min)
+    ))
@@ -3,32 +3,46 @@ NinyraWatermark — Flask routes only, no business logic.
 
 Endpoints:
   POST /api/preview       - return base64 preview
-  POST /api/export        - return file (with optional invisible watermark)
+  POST /api/export        - return raw file (zone info in X-Zone-* headers)
+  POST /api/export/batch  - export several images in parallel
   POST /api/fonts/upload  - upload a font
   GET  /api/fonts         - list fonts
   POST /api/verify        - verify invisible watermark
   POST /api/detect-faces  - run face detection on image
+  POST /api/detect-faces/batch - run face detection on several images
   GET  /api/presets       - list presets
   POST /api/presets       - save preset
   DELETE /api/presets/<n>  - delete preset
   GET  /health            - health check
 
 Response format always: { "success": bool, "data": ..., "error": str|null }
+(except a successful /api/export, which streams the image file itself)
+
+Image endpoints (preview/export/verify/detect-faces) accept either a JSON
+body with a base64 "image" field, or multipart/form-data with the raw file
+in "image" and the remaining fields as form values (objects JSON-encoded).
 """
 
 from __future__ import annotations
 
 import asyncio
-import base64
 import io
 import json
 import logging
-import sys
-from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from backend.config import (
     LOGS_DIR,
@@ -40,45 +54,112 @@ from backend.config import (
     load_config,
     save_config,
 )
+from backend.log_setup import setup_logging
 from backend.utils import success_response, error_response
-from backend.watermark import process_single_image, apply_watermark
 from backend.fonts import validate_font_file, save_uploaded_font, list_fonts
-from backend.ai_detection import detect_faces, get_face_exclusion_zones
-from backend.steganography import (
-    embed_watermark,
-    extract_watermark,
-    is_available as steg_available,
+from backend.utils import (
+    base64_to_image,
+    decode_image,
+    image_to_base64,
+    image_to_rgb_array,
+    log_pillow_build,
+    format_for_filename,
+    mimetype_for_format,
 )
-from backend.utils import base64_to_image, image_to_base64, format_for_filename
+
+# Detection, steganography and the watermark stack pull in MediaPipe and
+# friends; they are imported inside the endpoints so the server binds fast.
+if TYPE_CHECKING:
+    from backend.ai_detection import DetectionResult, FaceBBox
 
 # ---------------------------------------------------------------------------
 # Logging
 # ---------------------------------------------------------------------------
 LOG_FILE = LOGS_DIR / "app.log"
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[
-        logging.FileHandler(str(LOG_FILE)),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
+setup_logging(LOG_FILE)
 logger = logging.getLogger("ninyrawatermark.api")
 
 # ---------------------------------------------------------------------------
 # Flask app
 # ---------------------------------------------------------------------------
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson (C serializer, NumPy-aware)."""
+
+    def dumps(self, obj: object, **kwargs: object) -> str:
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        ).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: object) -> object:
+        return orjson.loads(s)
+
+
 app = Flask(__name__, static_folder=None)
 app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50 MB
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 
-# Thread pool for batch processing — max 4 threads
-executor = ThreadPoolExecutor(max_workers=4)
+# Thread pool for batch processing — PIL/NumPy release the GIL in C code;
+# R7 caps it at 4 threads, matching the FastAPI render workers
+executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
 
 # Resolve frontend dist directory
 _FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
 
 
+# Multipart form fields that carry JSON-encoded values
+_JSON_FORM_FIELDS = {"settings", "face_bboxes", "embed_invisible"}
+
+
+def _read_image_request() -> tuple[str | bytes | None, dict[str, object]]:
+    """Return (image, fields) from a JSON or multipart/form-data request.
+
+    Multipart uploads yield raw file bytes, skipping the base64 round-trip;
+    JSON requests yield the base64 string as before.
+    """
+    if "image" in request.files:
+        fields: dict[str, object] = {}
+        for key, value in request.form.items():
+            if key not in _JSON_FORM_FIELDS:
+                fields[key] = value
+                continue
+            try:
+                fields[key] = json.loads(value)
+            except ValueError:
+                raise ValueError(f"Invalid JSON in form field '{key}'") from None
+        return request.files["image"].read(), fields
+
+    body = request.get_json(force=True) or {}
+    return body.get("image"), body
+
+
+def _resolve_faces(
+    faces_id: str | None,
+    face_bboxes_raw: list[dict[str, float]] | None,
+) -> list[FaceBBox] | None:
+    """Use server-cached faces for faces_id, else rebuild from the payload."""
+    from backend.ai_detection import faces_from_payload, recall_faces
+
+    faces = recall_faces(faces_id)
+    if faces is not None:
+        return faces
+    if face_bboxes_raw:
+        return faces_from_payload(face_bboxes_raw)
+    return None
+
+
+def _detection_response(detection: DetectionResult) -> dict[str, object]:
+    """Serialize a detection and attach a faces_id for later reuse."""
+    from backend.ai_detection import detection_to_dict, remember_faces
+
+    payload = detection_to_dict(detection)
+    payload["faces_id"] = remember_faces(detection.faces)
+    return payload
+
+
 # ---------------------------------------------------------------------------
 # CORS middleware
 # ---------------------------------------------------------------------------
@@ -88,6 +169,7 @@ def add_cors_headers(response):
     response.headers["Access-Control-Allow-Origin"] = "*"
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
     response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+    response.headers["Access-Control-Expose-Headers"] = "X-Zone-Used, X-Zone-Score"
     if request.method == "OPTIONS":
         response.status_code = 200
     return response
@@ -108,39 +190,31 @@ def health_check():
 @app.route("/api/preview", methods=["POST"])
 def api_preview():
     """Process a single image and return base64 preview."""
+    from backend.watermark import process_single_image
+
     try:
-        body = request.get_json(force=True)
-        if not body or "image" not in body:
+        image_data, body = _read_image_request()
+        if not image_data:
             return jsonify(error_response("Missing 'image' field")), 400
 
-        image_b64 = body["image"]
         settings = body.get("settings", {})
         name = body.get("name", "image.png")
         font_path = body.get("font_path")
         face_bboxes_raw = body.get("face_bboxes")
 
-        # Reconstruct face bboxes if provided
-        face_bboxes = None
-        if face_bboxes_raw:
-            from backend.ai_detection import FaceBBox
-            face_bboxes = [
-                FaceBBox(
-                    x_min=f["x_min"], y_min=f["y_min"],
-                    x_max=f["x_max"], y_max=f["y_max"],
-                    confidence=f.get("confidence", 0.0),
-                )
-                for f in face_bboxes_raw
-            ]
+        face_bboxes = _resolve_faces(body.get("faces_id"), face_bboxes_raw)
 
         result = process_single_image(
-            image_b64, settings, name,
+            image_data, settings, name,
             face_bboxes=face_bboxes,
             font_path=font_path,
             embed_invisible=False,
+            preview=True,
         )
 
         return jsonify(success_response({
             "result": result["image_base64"],
+            "mimetype": result["mimetype"],
             "zone_used": result["zone_used"],
             "zone_score": round(result["zone_score"], 2),
         }))
@@ -159,42 +233,38 @@ def api_preview():
 @app.route("/api/export", methods=["POST"])
 def api_export():
     """Process image and return file with optional invisible watermark."""
+    from backend.watermark import process_single_image
+
     try:
-        body = request.get_json(force=True)
-        if not body or "image" not in body:
+        image_data, body = _read_image_request()
+        if not image_data:
             return jsonify(error_response("Missing 'image' field")), 400
 
-        image_b64 = body["image"]
         settings = body.get("settings", {})
         name = body.get("name", "image.png")
         font_path = body.get("font_path")
         embed_invisible = body.get("embed_invisible", False)
         face_bboxes_raw = body.get("face_bboxes")
 
-        face_bboxes = None
-        if face_bboxes_raw:
-            from backend.ai_detection import FaceBBox
-            face_bboxes = [
-                FaceBBox(
-                    x_min=f["x_min"], y_min=f["y_min"],
-                    x_max=f["x_max"], y_max=f["y_max"],
-                    confidence=f.get("confidence", 0.0),
-                )
-                for f in face_bboxes_raw
-            ]
+        face_bboxes = _resolve_faces(body.get("faces_id"), face_bboxes_raw)
 
         result = process_single_image(
-            image_b64, settings, name,
+            image_data, settings, name,
             face_bboxes=face_bboxes,
             font_path=font_path,
             embed_invisible=embed_invisible,
+            raw_bytes=True,
         )
 
-        return jsonify(success_response({
-            "result": result["image_base64"],
-            "zone_used": result["zone_used"],
-            "zone_score": round(result["zone_score"], 2),
-        }))
+        response = send_file(
+            io.BytesIO(result["image_bytes"]),
+            mimetype=mimetype_for_format(format_for_filename(name)),
+            as_attachment=True,
+            download_name=name,
+        )
+        response.headers["X-Zone-Used"] = result["zone_used"]
+        response.headers["X-Zone-Score"] = f"{result['zone_score']:.2f}"
+        return response
 
     except ValueError as exc:
         logger.error("Invalid input for export: %s", exc)
@@ -204,6 +274,65 @@ def api_export():
         return jsonify(error_response("Export error")), 500
 
 
+@app.route("/api/export/batch", methods=["POST"])
+def api_export_batch():
+    """Export several images in parallel on the thread pool.
+
+    Body: {"images": [{"image", "name", ...per-image overrides}], "settings",
+    "font_path", "embed_invisible"}. Results keep the input order; a failed
+    item carries an "error" instead of a "result".
+    """
+    from backend.watermark import process_single_image
+
+    try:
+        body = request.get_json(force=True)
+        if not body or not isinstance(body.get("images"), list):
+            return jsonify(error_response("Missing 'images' list")), 400
+
+        items = body["images"]
+        settings = body.get("settings", {})
+        font_path = body.get("font_path")
+        embed_invisible = body.get("embed_invisible", False)
+
+        results: list[dict[str, object] | None] = [None] * len(items)
+        futures = {}
+        for index, item in enumerate(items):
+            name = item.get("name", "image.png") if isinstance(item, dict) else "image.png"
+            if not isinstance(item, dict) or not item.get("image"):
+                results[index] = {"name": name, "error": "Missing 'image' field"}
+                continue
+            future = executor.submit(
+                process_single_image,
+                item["image"],
+                item.get("settings", settings),
+                name,
+                face_bboxes=_resolve_faces(item.get("faces_id"), item.get("face_bboxes")),
+                font_path=item.get("font_path", font_path),
+                embed_invisible=item.get("embed_invisible", embed_invisible),
+            )
+            futures[future] = (index, name)
+
+        for future in as_completed(futures):
+            index, name = futures[future]
+            try:
+                result = future.result()
+                results[index] = {
+                    "name": name,
+                    "result": result["image_base64"],
+                    "zone_used": result["zone_used"],
+                    "zone_score": round(result["zone_score"], 2),
+                }
+            except Exception as exc:
+                logger.error("Batch export failed for %s: %s", name, exc)
+                results[index] = {"name": name, "error": "Export error"}
+
+        return jsonify(success_response({"results": results}))
+
+    except Exception as exc:
+        logger.error("Batch export error: %s", exc, exc_info=True)
+        return jsonify(error_response("Export error")), 500
+
+
 # ---------------------------------------------------------------------------
 # Font upload
 # ---------------------------------------------------------------------------
@@ -222,12 +351,12 @@ def api_fonts_upload():
         filename = file.filename
 
         # Validate
-        valid, err_msg = validate_font_file(data, filename)
+        valid, err_msg, font_name = validate_font_file(data, filename)
         if not valid:
             return jsonify(error_response(err_msg)), 422
 
         # Save
-        ok, save_err, font_name = save_uploaded_font(data, filename)
+        ok, save_err, font_name = save_uploaded_font(data, filename, font_name)
         if not ok:
             return jsonify(error_response(save_err)), 500
 
@@ -261,6 +390,8 @@ def api_fonts_list():
 @app.route("/api/verify", methods=["POST"])
 def api_verify():
     """Verify invisible watermark in an uploaded image."""
+    from backend.steganography import extract_watermark, is_available as steg_available
+
     try:
         if not steg_available():
             return jsonify(error_response(
@@ -268,11 +399,11 @@ def api_verify():
                 "Install: pip install invisible-watermark"
             )), 422
 
-        body = request.get_json(force=True)
-        if not body or "image" not in body:
+        image_data, _ = _read_image_request()
+        if not image_data:
             return jsonify(error_response("Missing 'image' field")), 400
 
-        image = base64_to_image(body["image"])
+        image = decode_image(image_data)
         found, extracted = extract_watermark(image)
 
         return jsonify(success_response({
@@ -281,6 +412,9 @@ def api_verify():
             "message": extracted,
         }))
 
+    except ValueError as exc:
+        logger.error("Invalid input for verify: %s", exc)
+        return jsonify(error_response(str(exc))), 400
     except Exception as exc:
         logger.error("Verify error: %s", exc, exc_info=True)
         return jsonify(error_response("Verification failed")), 500
@@ -293,31 +427,49 @@ def api_verify():
 def api_detect_faces():
     """Run face detection on an uploaded image."""
     try:
-        body = request.get_json(force=True)
-        if not body or "image" not in body:
+        image_data, _ = _read_image_request()
+        if not image_data:
             return jsonify(error_response("Missing 'image' field")), 400
 
-        import numpy as np
-        image = base64_to_image(body["image"])
-        image_array = np.array(image.convert("RGB"))
+        from backend.ai_detection import detect_faces
+        image_array = image_to_rgb_array(decode_image(image_data))
         detection = detect_faces(image_array)
 
-        zones = get_face_exclusion_zones(detection)
+        return jsonify(success_response(_detection_response(detection)))
+
+    except ValueError as exc:
+        logger.error("Invalid input for face detection: %s", exc)
+        return jsonify(error_response(str(exc))), 400
+    except Exception as exc:
+        logger.error("Face detection error: %s", exc, exc_info=True)
+        return jsonify(error_response("Face detection failed")), 500
+
+
+@app.route("/api/detect-faces/batch", methods=["POST"])
+def api_detect_faces_batch():
+    """Run face detection on several uploaded images in one request."""
+    try:
+        body = request.get_json(force=True)
+        if not body or not isinstance(body.get("images"), list):
+            return jsonify(error_response("Missing 'images' list")), 400
+
+        from backend.ai_detection import detect_faces_batch
+        # Decoded lazily, so only the image being detected is held in memory
+        image_arrays = (
+            image_to_rgb_array(base64_to_image(image_b64))
+            for image_b64 in body["images"]
+        )
+        detections = detect_faces_batch(image_arrays)
 
         return jsonify(success_response({
-            "faces": [{
-                "x_min": f.x_min, "y_min": f.y_min,
-                "x_max": f.x_max, "y_max": f.y_max,
-                "confidence": round(f.confidence, 3),
-            } for f in detection.faces],
-            "exclusion_zones": zones,
-            "mediapipe_available": detection.mediapipe_available,
-            "image_width": detection.image_width,
-            "image_height": detection.image_height,
+            "results": [_detection_response(d) for d in detections],
         }))
 
+    except ValueError as exc:
+        logger.error("Invalid input for batch face detection: %s", exc)
+        return jsonify(error_response(str(exc))), 400
     except Exception as exc:
-        logger.error("Face detection error: %s", exc, exc_info=True)
+        logger.error("Batch face detection error: %s", exc, exc_info=True)
         return jsonify(error_response("Face detection failed")), 500
 
 
@@ -411,17 +563,34 @@ def serve_index():
     return send_from_directory(str(_FRONTEND_DIR), "index.html")
 
 
+@lru_cache(maxsize=1024)
+def _resolve_static(filename: str) -> str:
+    """Map a request path to a frontend file, falling back to index.html.
+
+    Cached so repeated asset requests don't re-stat the filesystem.
+    """
+    if (_FRONTEND_DIR / filename).is_file():
+        return filename
+    return "index.html"
+
+
 @app.route("/<path:filename>")
 def serve_static(filename: str):
     """Serve frontend static files."""
-    file_path = _FRONTEND_DIR / filename
-    if file_path.is_file():
-        return send_from_directory(str(_FRONTEND_DIR), filename)
-    return send_from_directory(str(_FRONTEND_DIR), "index.html")
+    return send_from_directory(str(_FRONTEND_DIR), _resolve_static(filename))
 
 
 # ---------------------------------------------------------------------------
 # Entry point
 # ---------------------------------------------------------------------------
+def _warm_up() -> None:
+    """Import and warm the detection/steganography stack in the background."""
+    from backend import ai_detection, steganography, watermark  # noqa: F401
+    log_pillow_build()
+    ai_detection.warm_up()
+    steganography.warm_up()
+
+
 if __name__ == "__main__":
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
     app.run(host="0.0.0.0", port=8765, debug=False)
@@ -29,6 +29,12 @@ a = Analysis(
         (str(ROOT / 'assets'), 'assets'),
         # Include the MediaPipe face detection model
         (str(ROOT / 'backend' / 'blaze_face_short_range.tflite'), 'backend'),
+        # Optional int8-quantized variant, preferred when present
+        *[
+            (str(p), 'backend')
+            for p in [ROOT / 'backend' / 'blaze_face_short_range_int8.tflite']
+            if p.exists()
+        ],
     ],
     hiddenimports=[
         # FastAPI / Starlette internal imports that PyInstaller misses
@@ -71,6 +77,7 @@ a = Analysis(
         'backend.zone_detector',
         'backend.wm_types',
         'backend.ai_detection',
+        'backend.log_setup',
         # MediaPipe and its deps
         'mediapipe',
         'mediapipe.python',
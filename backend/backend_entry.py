@@ -19,8 +19,10 @@ from __future__ import annotations
 
 import argparse
 import logging
+import multiprocessing
 import os
 import sys
+from functools import lru_cache
 from pathlib import Path
 
 # ─── Logging Setup ───────────────────────────────────────────────────────────
@@ -28,17 +30,15 @@ LOG_DIR = Path.home() / ".ninyrawatermark" / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOG_DIR / "backend.log"
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[
-        logging.FileHandler(str(LOG_FILE), encoding="utf-8"),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
+try:
+    from backend.log_setup import setup_logging
+except ImportError:
+    from log_setup import setup_logging  # PyInstaller bundle layout
+
 logger = logging.getLogger("ninyrawatermark.entry")
 
 
+@lru_cache(maxsize=None)
 def get_dist_dir() -> Path:
     """
     Locate the React dist/ folder.
@@ -75,6 +75,9 @@ def get_dist_dir() -> Path:
 
 
 def main() -> None:
+    # Configured here, not at import: spawned render workers re-import this
+    # module and must not open their own handle on the rotating log file.
+    setup_logging(LOG_FILE)
     parser = argparse.ArgumentParser(description="NinyraWatermark Backend")
     parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
     parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind to")
@@ -110,6 +113,8 @@ def main() -> None:
             from main import app  # fallback for PyInstaller bundle layout  # noqa: F401
             logger.info("Imported app from main (bundle mode)")
 
+        # Detector, steganography and font warm-up runs in the app's
+        # startup hook, before uvicorn accepts connections.
         uvicorn.run(
             app,  # pass the object, not a string
             host=args.host,
@@ -126,4 +131,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Render workers are spawned processes; in the frozen app they re-run
+    # this executable and must stop here instead of starting a server.
+    multiprocessing.freeze_support()
     main()
@@ -7,11 +7,18 @@ Secrets and paths via ~/.ninyrawatermark/config.json.
 
 from __future__ import annotations
 
+import copy
 import json
 import logging
+from functools import cache
 from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger("ninyrawatermark.config")
 
 # ---------------------------------------------------------------------------
@@ -22,6 +29,7 @@ FONTS_DIR: Path = APP_DIR / "fonts"
 LOGS_DIR: Path = APP_DIR / "logs"
 CONFIG_FILE: Path = APP_DIR / "config.json"
 PRESETS_FILE: Path = APP_DIR / "presets.json"
+FONTS_CACHE_FILE: Path = APP_DIR / "fonts_cache.json"
 ASSETS_DIR: Path = Path(__file__).parent.parent / "assets"
 _PATREON_SVG_PATH: Path = ASSETS_DIR / "patreon_icon.svg"
 _PATREON_PNG_PATH: Path = ASSETS_DIR / "patreon_icon.png"
@@ -31,109 +39,22 @@ _YOUTUBE_SVG_PATH: Path = ASSETS_DIR / "youtube_icon.svg"
 _YOUTUBE_PNG_PATH: Path = ASSETS_DIR / "youtube_icon.png"
 
 
-def _rasterize_patreon(png_path: Path, size: int = 256) -> None:
-    """Draw the Patreon P logo with Pillow (circle + rect)."""
-    from PIL import Image, ImageDraw
-    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    scale = size / 64.0
-    cx, cy, r = 38 * scale, 20 * scale, 14 * scale
-    draw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=(255, 66, 77, 255))
-    rx = 4 * scale
-    x1, y1 = 4 * scale, 4 * scale
-    x2, y2 = (4 + 12) * scale, (4 + 56) * scale
-    draw.rounded_rectangle([x1, y1, x2, y2], radius=rx, fill=(255, 66, 77, 255))
-    img.save(str(png_path), "PNG")
-
-
-def _rasterize_telegram(png_path: Path, size: int = 256) -> None:
-    """Draw a flat Telegram paper-plane icon with Pillow."""
-    from PIL import Image, ImageDraw
-    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    s = size
-    # Blue circle background
-    draw.ellipse([0, 0, s - 1, s - 1], fill=(41, 182, 246, 255))
-    # Paper plane arrow: simple polygon
-    sc = s / 64.0
-    plane = [
-        (13.5 * sc, 31.2 * sc),
-        (49.2 * sc, 17.5 * sc),
-        (43.3 * sc, 23.5 * sc),
-        (23.7 * sc, 35.8 * sc),
-        (28.0 * sc, 47.0 * sc),
-        (29.8 * sc, 46.2 * sc),
-        (34.0 * sc, 42.2 * sc),
-        (42.7 * sc, 48.6 * sc),
-        (45.5 * sc, 47.3 * sc),
-        (51.5 * sc, 19.7 * sc),
-        (15.1 * sc, 33.1 * sc),
-    ]
-    draw.polygon(plane, fill=(255, 255, 255, 240))
-    img.save(str(png_path), "PNG")
-
-
-def _rasterize_youtube(png_path: Path, size: int = 256) -> None:
-    """Draw a YouTube play-button icon with Pillow."""
-    from PIL import Image, ImageDraw
-    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    s = size
-    # Red rounded rect background
-    draw.rounded_rectangle([0, 0, s - 1, s - 1], radius=s // 6, fill=(255, 0, 0, 255))
-    # White play triangle
-    m = s / 64.0
-    tri = [
-        (27.3 * m, 25.1 * m),
-        (27.3 * m, 38.9 * m),
-        (38.9 * m, 32.0 * m),
-    ]
-    draw.polygon(tri, fill=(255, 255, 255, 255))
-    img.save(str(png_path), "PNG")
-
-
-_BRAND_RASTERIZERS = {
-    "patreon": (_PATREON_SVG_PATH, _PATREON_PNG_PATH, _rasterize_patreon),
-    "telegram": (_TELEGRAM_SVG_PATH, _TELEGRAM_PNG_PATH, _rasterize_telegram),
-    "youtube": (_YOUTUBE_SVG_PATH, _YOUTUBE_PNG_PATH, _rasterize_youtube),
+_BRAND_ICONS: dict[str, tuple[Path, Path]] = {
+    "patreon": (_PATREON_PNG_PATH, _PATREON_SVG_PATH),
+    "telegram": (_TELEGRAM_PNG_PATH, _TELEGRAM_SVG_PATH),
+    "youtube": (_YOUTUBE_PNG_PATH, _YOUTUBE_SVG_PATH),
 }
 
 
-def _ensure_icon_png(brand: str) -> Path:
-    """Return path to a rasterised PNG icon for the given brand."""
-    svg_path, png_path, rasterizer = _BRAND_RASTERIZERS[brand]
-    if png_path.exists():
-        return png_path
-    # Try cairosvg first
-    if svg_path.exists():
-        try:
-            import cairosvg  # type: ignore[import-untyped]
-            cairosvg.svg2png(url=str(svg_path), write_to=str(png_path),
-                             output_width=256, output_height=256)
-            logger.info("Converted %s SVG -> PNG via cairosvg", brand)
-            return png_path
-        except Exception:
-            pass
-    # Pillow fallback
-    try:
-        rasterizer(png_path)
-        logger.info("Rasterised %s icon via Pillow", brand)
-        return png_path
-    except Exception as exc:
-        logger.warning("Failed to rasterise %s icon: %s", brand, exc)
-        return svg_path
-
-
-PATREON_ICON_PATH: Path = _ensure_icon_png("patreon")
-TELEGRAM_ICON_PATH: Path = _ensure_icon_png("telegram")
-YOUTUBE_ICON_PATH: Path = _ensure_icon_png("youtube")
-
-# Map brand → icon path for watermark renderer
-BRAND_ICON_PATHS: dict[str, Path] = {
-    "patreon": PATREON_ICON_PATH,
-    "telegram": TELEGRAM_ICON_PATH,
-    "youtube": YOUTUBE_ICON_PATH,
-}
+@cache
+def brand_icon_path(brand: str) -> Path:
+    """Icon path for a brand (unknown brands get Patreon).
+
+    The 256x256 PNGs are pre-rendered and shipped in assets/; if one is
+    missing the SVG path is returned and callers fall back to a drawn badge.
+    """
+    png_path, svg_path = _BRAND_ICONS.get(brand, _BRAND_ICONS["patreon"])
+    return png_path if png_path.exists() else svg_path
 
 # ---------------------------------------------------------------------------
 # Ensure directories exist on import
@@ -150,10 +71,24 @@ PATREON_RED: tuple[int, int, int] = (255, 66, 77)
 SIMILARITY_THRESHOLD: float = 15.0
 MIN_DIMENSION: int = 300
 FALLBACK_ZONE_INDEX: int = 8
+# Zone statistics sample every n-th pixel so the short side stays near this
+ZONE_SAMPLE_MIN_SIDE: int = 512
 
 # MediaPipe face detection
 FACE_BBOX_PADDING: float = 0.15
 FACE_FALLBACK_OPACITY: float = 0.5
+# Longest side fed to the detector; larger images are downscaled first
+FACE_DETECT_MAX_DIM: int = 1024
+# Prefer blaze_face_short_range_int8.tflite when it is bundled
+FACE_MODEL_QUANTIZED: bool = True
+
+# Output encoding: zlib level 1 is several times faster than PIL's
+# default 6 for ~10% larger PNGs; previews are sent as fast WebP.
+PNG_COMPRESS_LEVEL: int = 1
+PREVIEW_FORMAT: str = "WEBP"
+PREVIEW_WEBP_QUALITY: int = 85
+# Transparent areas are flattened onto this colour for JPEG output
+JPEG_BACKGROUND: tuple[int, int, int] = (255, 255, 255)
 
 # Steganography
 DEFAULT_WATERMARK_STRING: str = "NinyraWatermark"
@@ -220,11 +155,26 @@ ZONE_NAMES: dict[int, str] = {
 # ---------------------------------------------------------------------------
 # Config file helpers
 # ---------------------------------------------------------------------------
+def _read_json(path: Path) -> object:
+    """Parse a UTF-8 JSON file (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_json(path: Path, data: object) -> None:
+    """Write data as indented UTF-8 JSON (orjson when available)."""
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
 def load_config() -> dict[str, str | float | bool]:
     """Load user config from disk."""
     if CONFIG_FILE.exists():
         try:
-            return json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
+            return _read_json(CONFIG_FILE)
         except (json.JSONDecodeError, OSError) as exc:
             logger.warning("Failed to load config: %s", exc)
     return {}
@@ -235,10 +185,7 @@ def save_config(data: dict[str, str | float | bool]) -> None:
     try:
         existing = load_config()
         existing.update(data)
-        CONFIG_FILE.write_text(
-            json.dumps(existing, indent=2, ensure_ascii=False),
-            encoding="utf-8",
-        )
+        _write_json(CONFIG_FILE, existing)
     except OSError as exc:
         logger.error("Failed to save config: %s", exc)
 
@@ -254,24 +201,41 @@ def set_watermark_string(value: str) -> None:
     save_config({"watermark_string": value})
 
 
+# Parsed presets keyed by the file's mtime_ns (None when it doesn't exist)
+_presets_cache: tuple[int | None, dict[str, dict[str, str | float | int]]] | None = None
+
+
 def load_presets() -> dict[str, dict[str, str | float | int]]:
-    """Load presets from disk, merging with defaults."""
-    presets = dict(DEFAULT_PRESETS)
-    if PRESETS_FILE.exists():
-        try:
-            stored = json.loads(PRESETS_FILE.read_text(encoding="utf-8"))
-            presets.update(stored)
-        except (json.JSONDecodeError, OSError) as exc:
-            logger.warning("Failed to load presets: %s", exc)
-    return presets
+    """Load presets from disk, merging with defaults.
+
+    The file is only re-parsed when its mtime changes. Callers get a deep
+    copy and may edit presets freely before save_presets().
+    """
+    global _presets_cache
+    try:
+        mtime_ns: int | None = PRESETS_FILE.stat().st_mtime_ns
+    except OSError:
+        mtime_ns = None
+
+    cached = _presets_cache
+    if cached is None or cached[0] != mtime_ns:
+        presets = dict(DEFAULT_PRESETS)
+        if mtime_ns is not None:
+            try:
+                stored = _read_json(PRESETS_FILE)
+                presets.update(stored)
+            except (json.JSONDecodeError, OSError) as exc:
+                logger.warning("Failed to load presets: %s", exc)
+        cached = (mtime_ns, presets)
+        _presets_cache = cached
+    return copy.deepcopy(cached[1])
 
 
 def save_presets(presets: dict[str, dict[str, str | float | int]]) -> None:
     """Persist presets to disk."""
+    global _presets_cache
+    _presets_cache = None
     try:
-        PRESETS_FILE.write_text(
-            json.dumps(presets, indent=2, ensure_ascii=False),
-            encoding="utf-8",
-        )
+        _write_json(PRESETS_FILE, presets)
     except OSError as exc:
         logger.error("Failed to save presets: %s", exc)
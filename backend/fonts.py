@@ -7,15 +7,21 @@ Stores custom fonts in ~/.ninyrawatermark/fonts/.
 
 from __future__ import annotations
 
+import json
 import logging
+import os
 import re
-from pathlib import Path
+import struct
+import threading
+from functools import lru_cache
+from pathlib import Path, PurePath
 from typing import Optional
 
 from PIL import ImageFont
 
 from backend.config import (
     FONTS_DIR,
+    FONTS_CACHE_FILE,
     ACCEPTED_FONT_EXTENSIONS,
     FONT_MAGIC_BYTES,
 )
@@ -31,103 +37,313 @@ SYSTEM_FONT_DIRS: list[Path] = [
 ]
 
 
+_SANITIZE_RE = re.compile(r"[^a-zA-Z0-9_\-]")
+_UNDERSCORE_RE = re.compile(r"_+")
+
+
 def _sanitize_filename(name: str) -> str:
     """Remove special characters from font filename, keeping alphanumerics and dashes."""
-    stem = Path(name).stem
-    ext = Path(name).suffix.lower()
-    sanitized = re.sub(r"[^a-zA-Z0-9_\-]", "_", stem)
-    sanitized = re.sub(r"_+", "_", sanitized).strip("_")
+    path = PurePath(name)
+    ext = path.suffix.lower()
+    sanitized = _SANITIZE_RE.sub("_", path.stem)
+    sanitized = _UNDERSCORE_RE.sub("_", sanitized).strip("_")
     if not sanitized:
         sanitized = "font"
     return f"{sanitized}{ext}"
 
 
+# Magic byte prefixes per extension, as tuples for bytes.startswith()
+_FONT_MAGIC_PREFIXES: dict[str, tuple[bytes, ...]] = {
+    ext: tuple(prefixes) for ext, prefixes in FONT_MAGIC_BYTES.items()
+}
+
+
 def _validate_magic_bytes(data: bytes, extension: str) -> bool:
     """Check the file starts with valid font magic bytes."""
-    expected_list = FONT_MAGIC_BYTES.get(extension, [])
-    for magic in expected_list:
-        if data[:len(magic)] == magic:
-            return True
-    return False
+    return data.startswith(_FONT_MAGIC_PREFIXES.get(extension, ()))
+
 
+def validate_font_file(data: bytes, filename: str) -> tuple[bool, str, str]:
+    """Validate that uploaded data is a real font file.
 
-def validate_font_file(data: bytes, filename: str) -> tuple[bool, str]:
-    """Validate that uploaded data is a real font file."""
+    Returns (ok, error_msg, font_name); the display name comes from the
+    validation load so the upload doesn't have to parse the font again.
+    """
     ext = Path(filename).suffix.lower()
 
     if ext not in ACCEPTED_FONT_EXTENSIONS:
-        return False, f"Unsupported format: {ext}. Only .ttf and .otf allowed."
+        return False, f"Unsupported format: {ext}. Only .ttf and .otf allowed.", ""
 
     if not _validate_magic_bytes(data, ext):
-        return False, "File does not appear to be a valid font (bad magic bytes)."
+        return False, "File does not appear to be a valid font (bad magic bytes).", ""
 
-    # Try loading with PIL to confirm it's a usable font
-    import io
-    try:
-        font_io = io.BytesIO(data)
-        ImageFont.truetype(font_io, 24)
-    except Exception as exc:
-        logger.error("Font validation failed for %s: %s", filename, exc)
-        return False, "Font file is corrupted or not supported."
+    # Walk the sfnt table directory instead of parsing the whole font
+    tables = _sfnt_table_directory(data)
+    if tables is None:
+        logger.error("Font validation failed for %s: bad sfnt table directory", filename)
+        return False, "Font file is corrupted or not supported.", ""
 
-    return True, ""
-
-
-def save_uploaded_font(data: bytes, filename: str) -> tuple[bool, str, str]:
-    """Save validated font to FONTS_DIR. Returns (ok, error_msg, font_name)."""
+    font_name = None
+    if b"name" in tables:
+        offset, length = tables[b"name"]
+        try:
+            font_name = _parse_name_table(data[offset:offset + length])
+        except (struct.error, UnicodeDecodeError):
+            font_name = None
+
+    return True, "", font_name or Path(filename).stem
+
+
+def _sfnt_table_directory(data: bytes) -> dict[bytes, tuple[int, int]] | None:
+    """Return {tag: (offset, length)} if every table record fits in data."""
+    if len(data) < 12:
+        return None
+    (num_tables,) = struct.unpack_from(">H", data, 4)
+    if num_tables == 0 or 12 + 16 * num_tables > len(data):
+        return None
+
+    tables: dict[bytes, tuple[int, int]] = {}
+    for index in range(num_tables):
+        tag, _, offset, length = struct.unpack_from(">4sIII", data, 12 + 16 * index)
+        if offset + length > len(data):
+            return None
+        tables[tag] = (offset, length)
+    return tables
+
+
+def save_uploaded_font(
+    data: bytes,
+    filename: str,
+    font_name: str | None = None,
+) -> tuple[bool, str, str]:
+    """Save validated font to FONTS_DIR. Returns (ok, error_msg, font_name).
+
+    Pass the font_name from validate_font_file to skip re-reading the file.
+    """
     safe_name = _sanitize_filename(filename)
     dest = FONTS_DIR / safe_name
 
     # Avoid overwriting — append number
+    safe_path = PurePath(safe_name)
+    stem, ext = safe_path.stem, safe_path.suffix
     counter = 1
     while dest.exists():
-        stem = Path(safe_name).stem
-        ext = Path(safe_name).suffix
         dest = FONTS_DIR / f"{stem}_{counter}{ext}"
         counter += 1
 
     try:
         dest.write_bytes(data)
         logger.info("Font saved: %s", dest)
+        # A path that previously failed to load may now resolve to this file
+        clear_font_cache()
     except OSError as exc:
         logger.error("Failed to save font %s: %s", safe_name, exc)
         return False, f"Failed to save font: {exc}", ""
 
-    # Extract font name from metadata
-    font_name = _get_font_display_name(dest)
+    if font_name:
+        _remember_font_display_name(dest, font_name)
+    else:
+        # Extract font name from metadata
+        font_name = _get_font_display_name(dest)
     return True, "", font_name
 
 
-def _get_font_display_name(font_path: Path) -> str:
-    """Extract the human-readable font name using PIL."""
+# Display names keyed by path -> [mtime_ns, size, name], persisted in
+# FONTS_CACHE_FILE so fonts are only parsed again when they change.
+_font_name_cache: dict[str, list[object]] | None = None
+_font_name_cache_dirty = False
+_font_name_cache_lock = threading.Lock()
+
+
+def _load_font_name_cache() -> dict[str, list[object]]:
+    """Return the display-name cache, reading it from disk on first use."""
+    global _font_name_cache
+    if _font_name_cache is None:
+        _font_name_cache = {}
+        if FONTS_CACHE_FILE.exists():
+            try:
+                stored = json.loads(FONTS_CACHE_FILE.read_text(encoding="utf-8"))
+                if isinstance(stored, dict):
+                    _font_name_cache = stored
+            except (json.JSONDecodeError, OSError) as exc:
+                logger.warning("Failed to load font cache: %s", exc)
+    return _font_name_cache
+
+
+def _save_font_name_cache() -> None:
+    """Write the display-name cache to disk if it changed."""
+    global _font_name_cache_dirty
+    with _font_name_cache_lock:
+        if not _font_name_cache_dirty or _font_name_cache is None:
+            return
+        try:
+            FONTS_CACHE_FILE.write_text(
+                json.dumps(_font_name_cache, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            _font_name_cache_dirty = False
+        except OSError as exc:
+            logger.error("Failed to save font cache: %s", exc)
+
+
+def _read_font_name_table(font_path: Path) -> str | None:
+    """Read family and style straight from the sfnt 'name' table.
+
+    Only the table directory and the name table are read — no glyphs or
+    rasterizer state. Like FreeType, the typographic names (IDs 16/17)
+    win over the legacy ones (IDs 1/2); Windows English strings are
+    preferred, then any Windows string, then Mac Roman.
+    """
+    with open(font_path, "rb") as fh:
+        header = fh.read(12)
+        if header[:4] == b"ttcf":
+            # Collection: use the first font's offset table
+            (offset,) = struct.unpack(">I", fh.read(4))
+            fh.seek(offset)
+            header = fh.read(12)
+        (num_tables,) = struct.unpack_from(">H", header, 4)
+        directory = fh.read(16 * num_tables)
+        for index in range(num_tables):
+            tag, _, offset, length = struct.unpack_from(">4sIII", directory, 16 * index)
+            if tag == b"name":
+                break
+        else:
+            return None
+        fh.seek(offset)
+        return _parse_name_table(fh.read(length))
+
+
+def _parse_name_table(data: bytes) -> str | None:
+    """Pick the display name out of raw 'name' table bytes."""
+    _, count, storage = struct.unpack_from(">HHH", data, 0)
+    names: dict[int, str] = {}
+    ranks: dict[int, int] = {}
+    for index in range(count):
+        platform, encoding, language, name_id, length, offset = struct.unpack_from(
+            ">6H", data, 6 + 12 * index,
+        )
+        if name_id not in (1, 2, 16, 17):
+            continue
+        if platform == 3 and encoding in (0, 1, 10):
+            rank, codec = (0 if language == 0x409 else 1), "utf-16-be"
+        elif platform == 1 and encoding == 0:
+            rank, codec = 2, "mac_roman"
+        else:
+            continue
+        if rank >= ranks.get(name_id, 3):
+            continue
+        start = storage + offset
+        names[name_id] = data[start:start + length].decode(codec, errors="replace")
+        ranks[name_id] = rank
+
+    if 16 in names:
+        family, style = names[16], names.get(17) or names.get(2, "")
+    elif 1 in names:
+        family, style = names[1], names.get(2, "")
+    else:
+        return None
+    return f"{family} {style}".strip()
+
+
+def _read_font_display_name(font_path: Path) -> str:
+    """Extract the human-readable font name from the font's name table."""
+    try:
+        name = _read_font_name_table(font_path)
+        if name:
+            return name
+    except (OSError, struct.error, UnicodeDecodeError) as exc:
+        logger.debug("Could not parse name table of %s: %s", font_path, exc)
+
+    # Fall back to a full FreeType load
     try:
         font = ImageFont.truetype(str(font_path), 24)
-        name = font.getname()
-        return f"{name[0]} {name[1]}".strip() if name else font_path.stem
+        return _format_font_name(font.getname(), font_path.stem)
     except Exception:
         return font_path.stem
 
 
+def _format_font_name(name: tuple[str | None, str | None] | None, fallback: str) -> str:
+    """Join a FreeType (family, style) pair into a display name."""
+    if not name:
+        return fallback
+    return f"{name[0]} {name[1]}".strip()
+
+
+def _remember_font_display_name(font_path: Path, name: str) -> None:
+    """Record an already-known display name in the name cache."""
+    global _font_name_cache_dirty
+    try:
+        st = font_path.stat()
+    except OSError:
+        return
+    with _font_name_cache_lock:
+        _load_font_name_cache()[str(font_path)] = [st.st_mtime_ns, st.st_size, name]
+        _font_name_cache_dirty = True
+
+
+def _get_font_display_name(
+    font_path: Path, st: Optional[os.stat_result] = None,
+) -> str:
+    """Return the font's display name, parsing the file only if it changed."""
+    global _font_name_cache_dirty
+    if st is None:
+        try:
+            st = font_path.stat()
+        except OSError:
+            return font_path.stem
+
+    key = str(font_path)
+    with _font_name_cache_lock:
+        cache = _load_font_name_cache()
+        entry = cache.get(key)
+        if entry and entry[:2] == [st.st_mtime_ns, st.st_size]:
+            return str(entry[2])
+
+    name = _read_font_display_name(font_path)
+    with _font_name_cache_lock:
+        cache[key] = [st.st_mtime_ns, st.st_size, name]
+        _font_name_cache_dirty = True
+    return name
+
+
+# Known system fonts: (path, fallback display name)
+_SYSTEM_FONT_CANDIDATES: list[tuple[str, str]] = [
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", "DejaVu Sans Bold"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "DejaVu Sans"),
+    ("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", "Liberation Sans Bold"),
+    ("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", "Liberation Sans"),
+    ("/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf", "Ubuntu Bold"),
+    ("/usr/share/fonts/truetype/ubuntu/Ubuntu-Regular.ttf", "Ubuntu Regular"),
+    ("/System/Library/Fonts/Helvetica.ttc", "Helvetica"),
+    ("C:/Windows/Fonts/arialbd.ttf", "Arial Bold"),
+    ("C:/Windows/Fonts/arial.ttf", "Arial"),
+]
+
+_FONT_SUFFIXES: tuple[str, ...] = tuple(ACCEPTED_FONT_EXTENSIONS)
+
+
+def _dir_entries(directory: str) -> set[str]:
+    """Entry names in a directory (normcased), empty if it can't be read."""
+    try:
+        with os.scandir(directory) as entries:
+            return {os.path.normcase(entry.name) for entry in entries}
+    except OSError:
+        return set()
+
+
 def list_fonts() -> list[dict[str, str]]:
     """List all available fonts (system + custom uploaded)."""
     fonts: list[dict[str, str]] = []
 
-    # System fonts — scan known candidates
-    system_candidates = [
-        ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", "DejaVu Sans Bold"),
-        ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "DejaVu Sans"),
-        ("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", "Liberation Sans Bold"),
-        ("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", "Liberation Sans"),
-        ("/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf", "Ubuntu Bold"),
-        ("/usr/share/fonts/truetype/ubuntu/Ubuntu-Regular.ttf", "Ubuntu Regular"),
-        ("/System/Library/Fonts/Helvetica.ttc", "Helvetica"),
-        ("C:/Windows/Fonts/arialbd.ttf", "Arial Bold"),
-        ("C:/Windows/Fonts/arial.ttf", "Arial"),
-    ]
-
-    for path_str, fallback_name in system_candidates:
-        p = Path(path_str)
-        if p.exists():
+    # System fonts — one scandir per candidate directory instead of a stat
+    # per candidate; most candidates belong to other platforms.
+    present: dict[str, set[str]] = {}
+    for path_str, fallback_name in _SYSTEM_FONT_CANDIDATES:
+        parent, name = os.path.split(path_str)
+        if parent not in present:
+            present[parent] = _dir_entries(parent)
+        if os.path.normcase(name) in present[parent]:
+            p = Path(path_str)
             display = _get_font_display_name(p)
             fonts.append({
                 "name": display or fallback_name,
@@ -136,40 +352,94 @@ def list_fonts() -> list[dict[str, str]]:
             })
 
     # Custom uploaded fonts
-    if FONTS_DIR.exists():
-        for f in sorted(FONTS_DIR.iterdir()):
-            if f.suffix.lower() in ACCEPTED_FONT_EXTENSIONS:
-                display = _get_font_display_name(f)
-                fonts.append({
-                    "name": display,
-                    "path": str(f),
-                    "source": "custom",
-                })
+    try:
+        with os.scandir(FONTS_DIR) as it:
+            custom = sorted(
+                (entry for entry in it
+                 if entry.name.lower().endswith(_FONT_SUFFIXES) and entry.is_file()),
+                key=lambda entry: entry.name,
+            )
+    except OSError:
+        custom = []
+    for entry in custom:
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        fonts.append({
+            "name": _get_font_display_name(Path(entry.path), st),
+            "path": entry.path,
+            "source": "custom",
+        })
 
+    _save_font_name_cache()
     return fonts
 
 
+# Fallback chain, resolved once to the first font present on this system
+_FALLBACK_FONTS: list[str] = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "C:/Windows/Fonts/arialbd.ttf",
+]
+_RESOLVED_FALLBACK: Optional[str] = next(
+    (fb for fb in _FALLBACK_FONTS if Path(fb).is_file()), None,
+)
+
+
+# FreeType faces carry mutable render state (size, transform), so loaded
+# fonts are cached per thread rather than shared between request workers.
+_thread_fonts = threading.local()
+_font_cache_generation = 0
+
+
+def clear_font_cache() -> None:
+    """Invalidate every thread's font cache (after fonts are added or removed)."""
+    global _font_cache_generation
+    _font_cache_generation += 1
+
+
+def _font_mtime(path_or_name: Optional[str]) -> Optional[int]:
+    """Modification time of a font file, or None for names and missing files."""
+    if not path_or_name:
+        return None
+    try:
+        return os.stat(path_or_name).st_mtime_ns
+    except OSError:
+        return None
+
+
 def get_font(path_or_name: Optional[str], size: int) -> ImageFont.FreeTypeFont:
-    """Load a font by path or name at the given size, with fallback."""
+    """Load a font by path or name at the given size, with fallback.
+
+    The whole resolution is memoized per thread and (path_or_name, size,
+    file mtime), so a missing font costs its failed open and warning once,
+    and a font replaced at the same path is picked up on its next use.
+    """
+    loader = getattr(_thread_fonts, "loader", None)
+    if loader is None or _thread_fonts.generation != _font_cache_generation:
+        loader = _thread_fonts.loader = lru_cache(maxsize=256)(_load_font)
+        _thread_fonts.generation = _font_cache_generation
+    return loader(path_or_name, size, _font_mtime(path_or_name))
+
+
+def _load_font(
+    path_or_name: Optional[str], size: int, mtime: Optional[int],
+) -> ImageFont.FreeTypeFont:
+    """Uncached body of get_font; ``mtime`` only takes part in the cache key."""
     if path_or_name:
         try:
             return ImageFont.truetype(path_or_name, size)
         except (OSError, IOError):
             logger.warning("Font not found: %s, trying fallback", path_or_name)
 
-    # Fallback chain
-    fallbacks = [
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-        "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
-        "/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf",
-        "/System/Library/Fonts/Helvetica.ttc",
-        "C:/Windows/Fonts/arialbd.ttf",
-    ]
-    for fb in fallbacks:
+    if _RESOLVED_FALLBACK:
         try:
-            return ImageFont.truetype(fb, size)
+            return ImageFont.truetype(_RESOLVED_FALLBACK, size)
         except (OSError, IOError):
-            continue
+            pass
 
     logger.warning("No system font found, using PIL default font")
     try:
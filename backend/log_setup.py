@@ -0,0 +1,114 @@
+"""
+NinyraWatermark — Logging setup shared by all entry points.
+
+Request threads only enqueue log records; a background QueueListener owns
+the real file and console handlers, so disk writes never block a request.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import multiprocessing.queues
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from multiprocessing.context import BaseContext
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Log files rotate at this size, keeping a few old copies
+LOG_MAX_BYTES: int = 5 * 1024 * 1024
+LOG_BACKUP_COUNT: int = 3
+
+_listener: QueueListener | None = None
+
+# Records from spawned render workers, replayed into this process's loggers
+_worker_queue: multiprocessing.queues.Queue | None = None
+_worker_listener: QueueListener | None = None
+
+
+def setup_logging(log_file: Path, level: int = logging.INFO) -> None:
+    """Route root logging through a queue to a file and stdout.
+
+    Like logging.basicConfig, this is a no-op when the root logger already
+    has handlers, so the first entry point to configure logging wins.
+    """
+    global _listener
+
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(
+        str(log_file),
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True,
+    )
+    _listener.start()
+    atexit.register(_stop_listener)
+
+
+def _stop_listener() -> None:
+    """Flush queued records and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _ReplayHandler(logging.Handler):
+    """Hand a record from a worker process to the same-named local logger."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def worker_log_queue(ctx: BaseContext) -> multiprocessing.queues.Queue:
+    """Return the queue worker processes log into, starting its listener once.
+
+    Pass it to setup_worker_logging in the pool initializer; records then
+    reach the same file and console handlers as the parent's own logs.
+    """
+    global _worker_queue, _worker_listener
+
+    if _worker_queue is None:
+        _worker_queue = ctx.Queue()
+        _worker_listener = QueueListener(_worker_queue, _ReplayHandler())
+        _worker_listener.start()
+        atexit.register(_stop_worker_listener)
+    return _worker_queue
+
+
+def setup_worker_logging(
+    log_queue: multiprocessing.queues.Queue, level: int = logging.INFO,
+) -> None:
+    """Route a worker process's root logging to the parent through log_queue."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+
+
+def _stop_worker_listener() -> None:
+    """Flush records forwarded by worker processes and stop their listener."""
+    global _worker_listener
+    if _worker_listener is not None:
+        _worker_listener.stop()
+        _worker_listener = None
@@ -2,32 +2,38 @@
 NinyraWatermark — FastAPI backend application.
 
 Endpoints:
-  POST /process/single — process one image
-  POST /process/batch  — process multiple images
-  GET  /health         — health check
+  POST /process/single   — process one image
+  POST /process/batch    — process multiple images (NDJSON stream)
+  POST /api/preview      — preview (staged pipeline, frontend JSON format)
+  POST /api/export       — export raw file (zone info in X-Zone-* headers)
+  POST /api/detect-faces — face detection
+  GET  /health           — health check
 
 Rules:
   R3  — Error handling everywhere
-  R7  — Batch processing with async + ThreadPoolExecutor
+  R7  — Batch processing with async + a capped worker pool
   R15 — Auto-start on configured port
 """
 
 from __future__ import annotations
 
 import asyncio
+import multiprocessing
 import os
-import json
 import logging
-import sys
-from concurrent.futures import ThreadPoolExecutor
+import unicodedata
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections.abc import AsyncIterator
 from pathlib import Path
 from typing import Optional
+from urllib.parse import quote
 from dataclasses import asdict
+from functools import lru_cache
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
 from backend.wm_types import (
@@ -38,7 +44,30 @@ from backend.wm_types import (
     DEFAULT_PRESETS,
     ZONE_NAMES,
 )
-from backend.watermark import process_single_image
+from backend.watermark import apply_watermark, init_render_worker, process_single_image
+from backend.ai_detection import (
+    detect_faces,
+    detection_to_dict,
+    faces_from_payload,
+    recall_faces,
+    remember_faces,
+)
+from backend.config import brand_icon_path, load_presets, save_presets
+from backend.fonts import list_fonts
+from backend.log_setup import setup_logging, worker_log_queue
+from backend.pipeline import StagedPipeline
+from backend.utils import (
+    base64_to_image,
+    image_to_base64,
+    image_to_bytes,
+    image_to_rgb_array,
+    log_pillow_build,
+    format_for_filename,
+    mimetype_for_format,
+    preview_format,
+    success_response,
+    error_response,
+)
 
 # ---------------------------------------------------------------------------
 # Logging setup — R3: log to file
@@ -47,48 +76,9 @@ LOG_DIR = Path.home() / ".ninyrawatermark" / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOG_DIR / "app.log"
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[
-        logging.FileHandler(str(LOG_FILE)),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
+setup_logging(LOG_FILE)
 logger = logging.getLogger("ninyrawatermark.api")
 
-# ---------------------------------------------------------------------------
-# Config / Presets paths — R13
-# ---------------------------------------------------------------------------
-CONFIG_DIR = Path.home() / ".ninyrawatermark"
-CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-PRESETS_FILE = CONFIG_DIR / "presets.json"
-CONFIG_FILE = CONFIG_DIR / "config.json"
-
-
-def _load_presets() -> dict[str, dict[str, str | float | int]]:
-    """Load presets from disk, merging with defaults."""
-    presets = dict(DEFAULT_PRESETS)
-    if PRESETS_FILE.exists():
-        try:
-            stored = json.loads(PRESETS_FILE.read_text(encoding="utf-8"))
-            presets.update(stored)
-        except (json.JSONDecodeError, OSError) as exc:
-            logger.warning("Failed to load presets: %s", exc)
-    return presets
-
-
-def _save_presets(presets: dict[str, dict[str, str | float | int]]) -> None:
-    """Persist presets to disk."""
-    try:
-        PRESETS_FILE.write_text(
-            json.dumps(presets, indent=2, ensure_ascii=False),
-            encoding="utf-8",
-        )
-    except OSError as exc:
-        logger.error("Failed to save presets: %s", exc)
-
-
 # ---------------------------------------------------------------------------
 # Pydantic models for API
 # ---------------------------------------------------------------------------
@@ -151,8 +141,35 @@ class BatchResultItem(BaseModel):
     zone_score: float
 
 
-class BatchResponse(BaseModel):
-    results: list[BatchResultItem]
+class BatchErrorItem(BaseModel):
+    name: str
+    error: str
+
+
+class FaceBBoxPayload(BaseModel):
+    x_min: int
+    y_min: int
+    x_max: int
+    y_max: int
+    confidence: float = 0.0
+
+
+class PreviewRequest(BaseModel):
+    image: str  # base64
+    settings: dict[str, object] = Field(default_factory=dict)
+    name: str = "image.png"
+    font_path: Optional[str] = None
+    face_bboxes: Optional[list[FaceBBoxPayload]] = None
+    # Token from a prior /api/detect-faces call; preferred over face_bboxes
+    faces_id: Optional[str] = None
+
+
+class ExportRequest(PreviewRequest):
+    embed_invisible: bool = False
+
+
+class DetectFacesRequest(BaseModel):
+    image: str  # base64
 
 
 class PresetPayload(BaseModel):
@@ -179,11 +196,138 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Zone-Used", "X-Zone-Score"],
 )
 
 # Thread pool for batch processing — R7: max 4 threads
 executor = ThreadPoolExecutor(max_workers=4)
 
+# /process/* renders are CPU-bound, so they run in worker processes to get
+# past the GIL. Still capped at 4 workers (R7) so the CPU isn't saturated.
+PROCESS_WORKERS: int = min(4, os.cpu_count() or 1)
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _render_pool() -> Executor:
+    """Return the process pool for /process/*, creating it on first use.
+
+    Falls back to the thread pool if worker processes can't be started.
+    """
+    global _process_pool
+    if _process_pool is None:
+        ctx = multiprocessing.get_context("spawn")
+        try:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PROCESS_WORKERS,
+                mp_context=ctx,
+                initializer=init_render_worker,
+                initargs=(worker_log_queue(ctx),),
+            )
+        except (OSError, NotImplementedError) as exc:
+            logger.warning("Process pool unavailable, using threads: %s", exc)
+            return executor
+        logger.info("Render process pool started: %d workers", PROCESS_WORKERS)
+    return _process_pool
+
+# ---------------------------------------------------------------------------
+# Staged pipelines for the /api endpoints.
+# Stages run on the shared executor; bounded queues between them let
+# concurrent requests overlap decode, render and encode.
+# ---------------------------------------------------------------------------
+def _stage_decode(job: dict[str, object]) -> dict[str, object]:
+    """Stage 1: base64 → PIL image."""
+    job["image"] = base64_to_image(str(job["image_b64"]))
+    return job
+
+
+def _stage_watermark(job: dict[str, object]) -> dict[str, object]:
+    """Stage 2: zone detection + watermark render (+ invisible embed)."""
+    result_image, zone_name, zone_score, _ = apply_watermark(
+        job["image"], job["settings"],
+        face_bboxes=job["face_bboxes"],
+        font_path=job["font_path"],
+        keep_alpha=not (
+            job["raw_bytes"] and format_for_filename(str(job["name"])) == "JPEG"
+        ),
+    )
+    if job["embed_invisible"]:
+        from backend.steganography import embed_watermark, is_available
+        if is_available():
+            result_image = embed_watermark(result_image)
+    job["result_image"] = result_image
+    job["zone_used"] = zone_name
+    job["zone_score"] = zone_score
+    return job
+
+
+def _stage_encode(job: dict[str, object]) -> dict[str, object]:
+    """Stage 3: encode the result to raw bytes (export) or base64 (preview)."""
+    name = str(job["name"])
+    if job["raw_bytes"]:
+        fmt = format_for_filename(name)
+        encoded: dict[str, object] = {
+            "image_bytes": image_to_bytes(job["result_image"], fmt),
+        }
+    else:
+        fmt = preview_format(name)
+        encoded = {"result": image_to_base64(job["result_image"], fmt)}
+    encoded["mimetype"] = mimetype_for_format(fmt)
+    return {
+        **encoded,
+        "zone_used": job["zone_used"],
+        "zone_score": round(float(job["zone_score"]), 2),
+    }
+
+
+def _stage_decode_rgb(image_b64: str) -> object:
+    """Detection stage 1: base64 → RGB ndarray."""
+    return image_to_rgb_array(base64_to_image(image_b64))
+
+
+def _stage_detect(image_array: object) -> dict[str, object]:
+    """Detection stage 2: MediaPipe inference on the cached detector."""
+    detection = detect_faces(image_array)
+    payload = detection_to_dict(detection)
+    payload["faces_id"] = remember_faces(detection.faces)
+    return payload
+
+
+render_pipeline = StagedPipeline(
+    "render", [_stage_decode, _stage_watermark, _stage_encode], executor,
+)
+detect_pipeline = StagedPipeline(
+    "detect", [_stage_decode_rgb, _stage_detect], executor,
+)
+
+
+def _warm_up() -> None:
+    """Pay one-time init costs before the first request arrives."""
+    from backend import ai_detection, steganography
+    log_pillow_build()
+    ai_detection.warm_up()
+    steganography.warm_up()
+    for brand in ("patreon", "telegram", "youtube"):
+        brand_icon_path(brand)
+    list_fonts()
+
+
+@app.on_event("startup")
+async def _warm_up_workers() -> None:
+    """Warm caches in each worker; uvicorn accepts connections afterwards."""
+    await asyncio.get_running_loop().run_in_executor(executor, _warm_up)
+
+
+@app.on_event("shutdown")
+async def _stop_pipelines() -> None:
+    """Stop pipeline stage workers and the render process pool."""
+    global _process_pool
+    await render_pipeline.stop()
+    await detect_pipeline.stop()
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
 # ---------------------------------------------------------------------------
 # Serve frontend static files from dist/
 # Supports NINYRA_DIST_DIR env var (set by backend_entry.py for packaged app)
@@ -217,7 +361,7 @@ async def process_single(request: SingleRequest) -> SingleResponse:
         
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            executor,
+            _render_pool(),
             process_single_image,
             request.image,
             settings_dict,
@@ -240,55 +384,166 @@ async def process_single(request: SingleRequest) -> SingleResponse:
         raise HTTPException(status_code=500, detail=f"Processing error: {exc}") from exc
 
 
-@app.post("/process/batch", response_model=BatchResponse)
-async def process_batch(request: BatchRequest) -> BatchResponse:
-    """Process multiple images with watermark in parallel."""
+async def _batch_item(
+    pool: Executor,
+    img: BatchImageItem,
+    settings_dict: dict[str, object],
+    embed_invisible: bool,
+) -> BatchResultItem | BatchErrorItem:
+    """Render one batch image; failures become an error item for that image."""
+    try:
+        res = await asyncio.wrap_future(pool.submit(
+            process_single_image,
+            img.data,
+            settings_dict,
+            img.name,
+            None, # face_bboxes
+            None, # font_path
+            embed_invisible,
+        ))
+    except Exception as exc:
+        logger.error("Error processing batch image %s: %s", img.name, exc)
+        return BatchErrorItem(name=img.name, error=str(exc))
+    return BatchResultItem(
+        name=res["original_name"],
+        data=res["image_base64"],
+        zone_used=res["zone_used"],
+        zone_score=round(res["zone_score"], 2),
+    )
+
+
+@app.post("/process/batch")
+async def process_batch(request: BatchRequest) -> StreamingResponse:
+    """Process multiple images in parallel, streaming results as NDJSON.
+
+    Each line is a BatchResultItem (or a BatchErrorItem for an image that
+    failed), emitted in completion order so the first finished image isn't
+    held back by the slowest one.
+    """
     try:
         settings_obj = request.settings.to_watermark_settings()
-        settings_dict = asdict(settings_obj)
-
-        results = []
-        # Run in parallel using the executor
-        loop = asyncio.get_event_loop()
-        futures = [
-            loop.run_in_executor(
-                executor,
-                process_single_image,
-                img.data,
-                settings_dict,
-                img.name,
-                None, # face_bboxes
-                None, # font_path
-                settings_obj.embed_invisible,
-            )
+    except ValueError as exc:
+        logger.error("Invalid input for batch process: %s", exc)
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    settings_dict = asdict(settings_obj)
+
+    async def stream() -> AsyncIterator[bytes]:
+        # Submit every image up front; the pool works through them while
+        # lines are written out as each one finishes.
+        pool = _render_pool()
+        tasks = [
+            asyncio.ensure_future(_batch_item(
+                pool, img, settings_dict, settings_obj.embed_invisible,
+            ))
             for img in request.images
         ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                yield item.model_dump_json().encode() + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _content_disposition(name: str) -> str:
+    """Attachment header for ``name``, safe for latin-1 header encoding.
+
+    Like werkzeug's send_file: an ASCII ``filename`` fallback plus the
+    RFC 5987 ``filename*`` carrying the original UTF-8 name.
+    """
+    ascii_name = (
+        unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    )
+    ascii_name = "".join(
+        ch for ch in ascii_name if ch.isprintable() and ch not in '"\\;'
+    ).strip()
+    if not ascii_name or ascii_name.startswith("."):
+        # Nothing left of the stem (e.g. a Cyrillic name): keep the extension
+        ascii_name = "image" + ascii_name
+    return (
+        f'attachment; filename="{ascii_name}"; '
+        f"filename*=UTF-8''{quote(name, safe='')}"
+    )
+
+
+async def _run_render(
+    request: PreviewRequest,
+    embed_invisible: bool,
+    raw_bytes: bool,
+) -> dict[str, object]:
+    """Push a preview/export job through the render pipeline."""
+    face_bboxes = recall_faces(request.faces_id)
+    if face_bboxes is None and request.face_bboxes:
+        face_bboxes = faces_from_payload([f.model_dump() for f in request.face_bboxes])
+    job: dict[str, object] = {
+        "image_b64": request.image,
+        "settings": request.settings,
+        "name": request.name,
+        "font_path": request.font_path,
+        "face_bboxes": face_bboxes,
+        "embed_invisible": embed_invisible,
+        "raw_bytes": raw_bytes,
+    }
+    return await render_pipeline.submit(job)
+
+
+@app.post("/api/preview")
+async def api_preview(request: PreviewRequest) -> JSONResponse:
+    """Process a single image and return base64 preview."""
+    try:
+        result = await _run_render(request, embed_invisible=False, raw_bytes=False)
+        return JSONResponse(success_response(result))
+    except ValueError as exc:
+        logger.error("Invalid input for preview: %s", exc)
+        return JSONResponse(error_response(str(exc)), status_code=400)
+    except Exception as exc:
+        logger.error("Preview error: %s", exc, exc_info=True)
+        return JSONResponse(error_response("Processing error"), status_code=500)
 
-        # Wait for all images to process
-        processed_list = await asyncio.gather(*futures)
 
-        for res in processed_list:
-            results.append(BatchResultItem(
-                name=res["original_name"],
-                data=res["image_base64"],
-                zone_used=res["zone_used"],
-                zone_score=round(res["zone_score"], 2),
-            ))
-
-        return BatchResponse(results=list(results))
+@app.post("/api/export")
+async def api_export(request: ExportRequest) -> Response:
+    """Process image and return the file with optional invisible watermark."""
+    try:
+        result = await _run_render(
+            request, embed_invisible=request.embed_invisible, raw_bytes=True,
+        )
+        return Response(
+            content=result["image_bytes"],
+            media_type=result["mimetype"],
+            headers={
+                "Content-Disposition": _content_disposition(request.name),
+                "X-Zone-Used": str(result["zone_used"]),
+                "X-Zone-Score": f"{result['zone_score']:.2f}",
+            },
+        )
     except ValueError as exc:
-        logger.error("Invalid input for batch process: %s", exc)
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
+        logger.error("Invalid input for export: %s", exc)
+        return JSONResponse(error_response(str(exc)), status_code=400)
+    except Exception as exc:
+        logger.error("Export error: %s", exc, exc_info=True)
+        return JSONResponse(error_response("Export error"), status_code=500)
+
+
+@app.post("/api/detect-faces")
+async def api_detect_faces(request: DetectFacesRequest) -> JSONResponse:
+    """Run face detection on an uploaded image."""
+    try:
+        result = await detect_pipeline.submit(request.image)
+        return JSONResponse(success_response(result))
     except Exception as exc:
-        logger.error("Error processing batch: %s", exc, exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Batch processing error: {exc}") from exc
+        logger.error("Face detection error: %s", exc, exc_info=True)
+        return JSONResponse(error_response("Face detection failed"), status_code=500)
 
 
 @app.get("/presets", response_model=PresetsResponse)
 async def get_presets() -> PresetsResponse:
     """Get all saved presets."""
     try:
-        presets = _load_presets()
+        presets = load_presets()
         return PresetsResponse(presets=presets)
     except Exception as exc:
         logger.error("Error loading presets: %s", exc)
@@ -299,7 +554,7 @@ async def get_presets() -> PresetsResponse:
 async def save_preset(payload: PresetPayload) -> dict[str, str]:
     """Save a named preset."""
     try:
-        presets = _load_presets()
+        presets = load_presets()
         presets[payload.name] = {
             "style": payload.settings.style,
             "opacity": payload.settings.opacity,
@@ -308,7 +563,7 @@ async def save_preset(payload: PresetPayload) -> dict[str, str]:
             "color": payload.settings.color,
             "custom_text": payload.settings.custom_text,
         }
-        _save_presets(presets)
+        save_presets(presets)
         return {"status": "saved", "name": payload.name}
     except Exception as exc:
         logger.error("Error saving preset: %s", exc)
@@ -321,10 +576,10 @@ async def delete_preset(name: str) -> dict[str, str]:
     try:
         if name in DEFAULT_PRESETS:
             raise HTTPException(status_code=400, detail="Cannot delete default presets")
-        presets = _load_presets()
+        presets = load_presets()
         if name in presets:
             del presets[name]
-            _save_presets(presets)
+            save_presets(presets)
         return {"status": "deleted", "name": name}
     except HTTPException:
         raise
@@ -340,10 +595,15 @@ async def delete_preset(name: str) -> dict[str, str]:
 if DIST_DIR.exists():
     app.mount("/assets", StaticFiles(directory=str(DIST_DIR / "assets")), name="assets")
 
+    @lru_cache(maxsize=1024)
+    def _resolve_spa_path(full_path: str) -> str:
+        """Map a request path to a dist/ file, falling back to index.html."""
+        file_path = DIST_DIR / full_path
+        if file_path.is_file():
+            return str(file_path)
+        return str(DIST_DIR / "index.html")
+
     @app.get("/{full_path:path}")
     async def serve_spa(full_path: str) -> FileResponse:
         """Serve the React SPA. Serves index.html for all non-API routes."""
-        file_path = DIST_DIR / full_path
-        if file_path.is_file():
-            return FileResponse(str(file_path))
-        return FileResponse(str(DIST_DIR / "index.html"))
+        return FileResponse(_resolve_spa_path(full_path))
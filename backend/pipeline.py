@@ -0,0 +1,99 @@
+"""
+NinyraWatermark — Staged async pipeline with bounded queues.
+
+Each stage is a blocking callable executed on a shared ThreadPoolExecutor.
+Stages are connected by bounded asyncio queues: a slow stage applies
+backpressure instead of letting decoded images pile up in memory, while
+concurrent requests occupy different stages at the same time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable
+from concurrent.futures import Executor
+
+logger = logging.getLogger("ninyrawatermark.pipeline")
+
+# Default capacity of the queue in front of each stage
+DEFAULT_QUEUE_SIZE: int = 2
+
+
+class StagedPipeline:
+    """Run items through a fixed sequence of blocking stages."""
+
+    def __init__(
+        self,
+        name: str,
+        stages: list[Callable[[object], object]],
+        executor: Executor,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        workers_per_stage: int = 2,
+    ) -> None:
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.name = name
+        self._stages = stages
+        self._executor = executor
+        self._queue_size = queue_size
+        self._workers_per_stage = workers_per_stage
+        self._queues: list[asyncio.Queue[tuple[object, asyncio.Future[object]]]] = []
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def _start(self) -> None:
+        """Create stage queues and worker tasks on the running loop."""
+        self._queues = [
+            asyncio.Queue(maxsize=self._queue_size) for _ in self._stages
+        ]
+        self._tasks = [
+            asyncio.create_task(self._worker(index))
+            for index in range(len(self._stages))
+            for _ in range(self._workers_per_stage)
+        ]
+        logger.info(
+            "Pipeline '%s' started: %d stages, %d workers each",
+            self.name, len(self._stages), self._workers_per_stage,
+        )
+
+    async def stop(self) -> None:
+        """Cancel all stage workers."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+
+    async def submit(self, item: object) -> object:
+        """Feed an item into the first stage and await the final result."""
+        if not self._tasks:
+            self._start()
+        future: asyncio.Future[object] = asyncio.get_running_loop().create_future()
+        await self._queues[0].put((item, future))
+        return await future
+
+    async def _worker(self, index: int) -> None:
+        """Pull items for one stage, run it, and hand results downstream."""
+        func = self._stages[index]
+        inbox = self._queues[index]
+        is_last = index == len(self._stages) - 1
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item, future = await inbox.get()
+            try:
+                if future.done():
+                    continue
+                try:
+                    result = await loop.run_in_executor(self._executor, func, item)
+                except Exception as exc:
+                    if not future.done():
+                        future.set_exception(exc)
+                    continue
+                if is_last:
+                    if not future.done():
+                        future.set_result(result)
+                else:
+                    await self._queues[index + 1].put((result, future))
+            finally:
+                inbox.task_done()
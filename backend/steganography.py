@@ -17,12 +17,14 @@ from numpy.typing import NDArray
 from PIL import Image
 
 from backend.config import STEG_METHOD, get_watermark_string
+from backend.utils import image_to_rgb_array
 
 logger = logging.getLogger("ninyrawatermark.steganography")
 
 # Try to import invisible-watermark — graceful degradation
 _IW_AVAILABLE = False
 try:
+    import cv2  # imwatermark depends on OpenCV itself
     from imwatermark import WatermarkEncoder, WatermarkDecoder
     _IW_AVAILABLE = True
 except ImportError:
@@ -37,6 +39,21 @@ def is_available() -> bool:
     return _IW_AVAILABLE
 
 
+def warm_up() -> None:
+    """Run a tiny encode/decode so the wavelet/DCT setup happens before requests."""
+    if not _IW_AVAILABLE:
+        return
+    try:
+        wm_string = get_watermark_string()
+        encoder = WatermarkEncoder()
+        encoder.set_watermark("bytes", wm_string.encode("utf-8"))
+        encoded = encoder.encode(np.zeros((256, 256, 3), dtype=np.uint8), STEG_METHOD)
+        WatermarkDecoder("bytes", len(wm_string) * 8).decode(encoded, STEG_METHOD)
+        logger.info("invisible-watermark encoder/decoder warmed up")
+    except Exception as exc:
+        logger.warning("invisible-watermark warm-up failed: %s", exc)
+
+
 def embed_watermark(image: Image.Image, owner_string: str | None = None) -> Image.Image:
     """Embed an invisible watermark into the image using dwtDct."""
     if not _IW_AVAILABLE:
@@ -48,23 +65,27 @@ def embed_watermark(image: Image.Image, owner_string: str | None = None) -> Imag
 
     start = time.time()
 
-    # Convert to BGR numpy array (OpenCV format) for the library
-    rgb_array = np.array(image.convert("RGB"))
-    bgr_array = rgb_array[:, :, ::-1].copy()
+    # Convert to BGR numpy array (OpenCV format) for the library; one
+    # cvtColor pass writes the contiguous BGR buffer directly. RGBA input
+    # is read as-is and its alpha plane kept as a view.
+    if image.mode == "RGBA":
+        rgba_array = np.asarray(image)
+        bgr_array = cv2.cvtColor(rgba_array, cv2.COLOR_RGBA2BGR)
+    else:
+        rgba_array = None
+        bgr_array = cv2.cvtColor(image_to_rgb_array(image), cv2.COLOR_RGB2BGR)
 
     encoder = WatermarkEncoder()
     encoder.set_watermark("bytes", wm_string.encode("utf-8"))
     encoded = encoder.encode(bgr_array, STEG_METHOD)
 
-    # Convert back to RGB PIL Image
-    result_rgb = encoded[:, :, ::-1]
-    result_image = Image.fromarray(result_rgb, "RGB")
-
-    # Restore alpha channel if original had one
-    if image.mode == "RGBA":
-        alpha = image.split()[3]
-        result_image = result_image.convert("RGBA")
-        result_image.putalpha(alpha)
+    # Convert back to a PIL Image, restoring alpha if the original had one
+    if rgba_array is not None:
+        result_rgba = cv2.cvtColor(encoded, cv2.COLOR_BGR2RGBA)
+        result_rgba[..., 3] = rgba_array[..., 3]
+        result_image = Image.fromarray(result_rgba, "RGBA")
+    else:
+        result_image = Image.fromarray(cv2.cvtColor(encoded, cv2.COLOR_BGR2RGB), "RGB")
 
     elapsed = time.time() - start
     logger.info("Watermark embedded in %.2fs", elapsed)
@@ -79,8 +100,7 @@ def extract_watermark(image: Image.Image) -> tuple[bool, str]:
 
     start = time.time()
 
-    rgb_array = np.array(image.convert("RGB"))
-    bgr_array = rgb_array[:, :, ::-1].copy()
+    bgr_array = cv2.cvtColor(image_to_rgb_array(image), cv2.COLOR_RGB2BGR)
 
     decoder = WatermarkDecoder("bytes", len(get_watermark_string()) * 8)
     extracted_bytes = decoder.decode(bgr_array, STEG_METHOD)
@@ -6,43 +6,137 @@ Shared functions for image encoding/decoding and response formatting.
 
 from __future__ import annotations
 
-import base64
-import hashlib
 import io
 import logging
+from binascii import a2b_base64, b2a_base64
 from functools import lru_cache
 from pathlib import Path
 
-from PIL import Image
+import numpy as np
+from numpy.typing import NDArray
+import PIL
+from PIL import Image, features
+
+from backend.config import (
+    JPEG_BACKGROUND,
+    PNG_COMPRESS_LEVEL,
+    PREVIEW_FORMAT,
+    PREVIEW_WEBP_QUALITY,
+)
 
 logger = logging.getLogger("ninyrawatermark.utils")
 
 
-def image_to_base64(image: Image.Image, fmt: str = "PNG") -> str:
-    """Convert a PIL Image to a base64-encoded string."""
+def flatten_alpha(image: Image.Image) -> Image.Image:
+    """Composite an RGBA image onto the JPEG background colour, as RGB.
+
+    convert("RGB") would just drop alpha and expose whatever colour the
+    transparent pixels happen to hold. One masked paste onto a fresh
+    canvas does the composite in C; a cached canvas would need a full copy
+    per call anyway, which costs the same as Image.new.
+    """
+    background = Image.new("RGB", image.size, JPEG_BACKGROUND)
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def _encode(image: Image.Image, fmt: str, compress_level: int) -> io.BytesIO:
+    """Encode a PIL Image into a new in-memory buffer.
+
+    PNG uses a low zlib level, JPEG skips the optimize pass and WebP uses
+    the fastest method — encode speed matters more than a few percent size.
+    Pillow's wheels link libjpeg-turbo, so JPEG already takes the SIMD path.
+    """
     buffer = io.BytesIO()
-    if fmt.upper() == "JPEG":
+    fmt = fmt.upper()
+    if fmt == "JPEG":
         if image.mode == "RGBA":
-            image = image.convert("RGB")
-    image.save(buffer, format=fmt, quality=95)
-    buffer.seek(0)
-    return base64.b64encode(buffer.read()).decode("utf-8")
+            image = flatten_alpha(image)
+        image.save(buffer, format=fmt, quality=95, optimize=False)
+    elif fmt == "WEBP":
+        image.save(buffer, format=fmt, quality=PREVIEW_WEBP_QUALITY, method=0)
+    else:
+        image.save(buffer, format=fmt, compress_level=compress_level)
+    return buffer
+
+
+def image_to_bytes(
+    image: Image.Image,
+    fmt: str = "PNG",
+    compress_level: int = PNG_COMPRESS_LEVEL,
+) -> bytes:
+    """Encode a PIL Image to raw file bytes in the given format."""
+    return _encode(image, fmt, compress_level).getvalue()
+
+
+def image_to_base64(
+    image: Image.Image,
+    fmt: str = "PNG",
+    compress_level: int = PNG_COMPRESS_LEVEL,
+) -> str:
+    """Convert a PIL Image to a base64-encoded string."""
+    buffer = _encode(image, fmt, compress_level)
+    return b2a_base64(buffer.getbuffer(), newline=False).decode("ascii")
+
+
+def mimetype_for_format(fmt: str) -> str:
+    """Return the MIME type for a PIL format name."""
+    return {
+        "JPEG": "image/jpeg",
+        "WEBP": "image/webp",
+    }.get(fmt.upper(), "image/png")
+
+
+def preview_format(filename: str) -> str:
+    """Format for preview images: WebP when Pillow supports it."""
+    if PREVIEW_FORMAT == "WEBP" and not features.check("webp"):
+        return format_for_filename(filename)
+    return PREVIEW_FORMAT
 
 
 @lru_cache(maxsize=32)
-def _decode_cached(data_hash: str, data: str) -> Image.Image:
-    """Internal cached decoder."""
-    image_data = base64.b64decode(data)
-    buffer = io.BytesIO(image_data)
-    # We copy() to ensure the cached original isn't mutated
-    return Image.open(buffer).copy()
+def _decode_cached(data: str) -> Image.Image:
+    """Internal cached decoder.
+
+    a2b_base64 skips whitespace (e.g. MIME-style 76-column wrapping) and
+    raises binascii.Error, a ValueError, on bad padding.
+    """
+    if not data:
+        raise ValueError("Invalid base64 image data")
+    return bytes_to_image(a2b_base64(data))
 
 
 def base64_to_image(data: str) -> Image.Image:
-    """Convert a base64-encoded string to a PIL Image with caching."""
-    # Use MD5 of the first 1MB for speed-efficient cache key
-    key = hashlib.md5(data[:1024*1024].encode()).hexdigest()
-    return _decode_cached(key, data).copy()
+    """Convert a base64-encoded string to a PIL Image with caching.
+
+    The returned image is shared with the cache: callers must not modify
+    it in place (convert()/copy() first, as the watermark code does).
+    """
+    return _decode_cached(data)
+
+
+def image_to_rgb_array(image: Image.Image) -> NDArray[np.uint8]:
+    """Return an (H, W, 3) uint8 view of the image, converting only if needed.
+
+    The result may be read-only; callers that write to it must copy.
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.asarray(image)
+
+
+def bytes_to_image(data: bytes) -> Image.Image:
+    """Decode raw encoded image bytes (PNG/JPEG/WebP) into a PIL Image."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def decode_image(data: str | bytes) -> Image.Image:
+    """Decode raw bytes or a base64 string into a PIL Image."""
+    if isinstance(data, bytes):
+        return bytes_to_image(data)
+    return base64_to_image(data)
 
 
 def format_for_filename(filename: str) -> str:
@@ -53,6 +147,22 @@ def format_for_filename(filename: str) -> str:
     return "PNG"
 
 
+def log_pillow_build() -> None:
+    """Log which Pillow build and codecs are in use (once, at warm-up)."""
+    # Pillow-SIMD publishes its releases as <pillow version>.postN
+    simd = ".post" in PIL.__version__
+    logger.info(
+        "Pillow %s%s: libjpeg-turbo=%s, webp=%s",
+        PIL.__version__, " (SIMD)" if simd else "",
+        features.check_feature("libjpeg_turbo"), features.check("webp"),
+    )
+    if not simd:
+        logger.debug(
+            "Pillow-SIMD is a drop-in replacement with faster resize/paste: "
+            "pip uninstall pillow && pip install pillow-simd"
+        )
+
+
 def success_response(data: object = None) -> dict[str, object]:
     """Build a standardized success API response."""
     return {"success": True, "data": data, "error": None}
@@ -9,9 +9,10 @@ Renders watermarks in three styles:
 
 from __future__ import annotations
 
-import base64
 import io
 import logging
+import multiprocessing.queues
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -21,15 +22,22 @@ from PIL import Image, ImageDraw, ImageFont
 
 from backend.config import (
     PATREON_RED,
-    PATREON_ICON_PATH,
-    BRAND_ICON_PATHS,
+    PNG_COMPRESS_LEVEL,
     SIZE_MULTIPLIERS,
     ZONE_NAMES,
+    brand_icon_path,
 )
 from backend.fonts import get_font
 from backend.zone_detector import detect_best_zone
-from backend.ai_detection import detect_faces, is_zone_overlapping_faces
-from backend.utils import image_to_base64, base64_to_image, format_for_filename
+from backend.utils import (
+    image_to_base64,
+    image_to_bytes,
+    decode_image,
+    flatten_alpha,
+    format_for_filename,
+    mimetype_for_format,
+    preview_format,
+)
 
 logger = logging.getLogger("ninyrawatermark.watermark")
 
@@ -51,16 +59,28 @@ def _detect_brand(text: str) -> str:
     return "patreon"
 
 
-def _create_brand_icon(brand: str, size: int) -> Image.Image:
-    """Load (and cache) the brand icon at the given size."""
-    icon_path = BRAND_ICON_PATHS.get(brand, PATREON_ICON_PATH)
+@lru_cache(maxsize=8)
+def _brand_icon_source(brand: str) -> Optional[Image.Image]:
+    """Decode the brand's full-size icon once; None if it can't be loaded."""
+    icon_path = brand_icon_path(brand)
     if icon_path.exists():
         try:
-            icon = Image.open(icon_path).convert("RGBA")
-            icon = icon.resize((size, size), Image.Resampling.LANCZOS)
-            return icon
+            return Image.open(icon_path).convert("RGBA")
         except Exception as exc:
             logger.warning("Failed to load %s icon: %s", brand, exc)
+    return None
+
+
+@lru_cache(maxsize=32)
+def _create_brand_icon(brand: str, size: int) -> Image.Image:
+    """Load (and cache) the brand icon at the given size.
+
+    The returned image is shared with the cache: callers paste it and must
+    not modify it in place.
+    """
+    source = _brand_icon_source(brand)
+    if source is not None:
+        return source.resize((size, size), Image.Resampling.LANCZOS)
 
     # Fallback: coloured circle with first letter
     icon = Image.new("RGBA", (size, size), (0, 0, 0, 0))
@@ -78,6 +98,18 @@ def _create_brand_icon(brand: str, size: int) -> Image.Image:
     return icon
 
 
+@lru_cache(maxsize=256)
+def _text_bbox(
+    font: ImageFont.FreeTypeFont | ImageFont.ImageFont, text: str,
+) -> tuple[int, int, int, int]:
+    """Measure text once per (font, text).
+
+    Keyed on the font object itself (get_font hands out cached instances),
+    which also keeps it alive so the key can't be reused by another font.
+    """
+    return font.getbbox(text)
+
+
 def _get_text_color(color: str) -> tuple[int, int, int]:
     """Return RGB text color based on the theme."""
     return (255, 255, 255) if color == "light" else (20, 20, 20)
@@ -102,11 +134,13 @@ def _render_style_text(
     font_size = max(12, int(target_width * 0.14))
     font = get_font(font_path, font_size)
 
-    dummy = Image.new("RGBA", (1, 1))
-    dd = ImageDraw.Draw(dummy)
-    bbox = dd.textbbox((0, 0), text, font=font)
+    bbox = _text_bbox(font, text)
     text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
 
+    # Offset shadow = two draw.text calls. A single stroked draw.text
+    # (stroke_fill=shadow) measured ~1.6x slower and looks different, and
+    # reusing one glyph mask for both passes was no faster; the element
+    # cache makes this a once-per-size cost anyway.
     shadow_offset = max(2, font_size // 12)
     wm_w = text_w + shadow_offset + 4
     wm_h = text_h + shadow_offset + 4
@@ -135,9 +169,7 @@ def _render_style_icon_text(
     font_size = max(12, int(target_width * 0.13))
     font = get_font(font_path, font_size)
 
-    dummy = Image.new("RGBA", (1, 1))
-    dd = ImageDraw.Draw(dummy)
-    bbox = dd.textbbox((0, 0), text, font=font)
+    bbox = _text_bbox(font, text)
     text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
 
     icon_size = int(text_h * 1.3)
@@ -165,6 +197,21 @@ def _render_style_icon_text(
     return wm_img
 
 
+@lru_cache(maxsize=32)
+def _rounded_bg(
+    width: int, height: int, radius: int, fill: tuple[int, int, int, int],
+) -> Image.Image:
+    """Rasterise the branded block's rounded background once per shape.
+
+    Shared with the cache: callers copy it before drawing on top.
+    """
+    bg = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    ImageDraw.Draw(bg).rounded_rectangle(
+        [0, 0, width - 1, height - 1], radius=radius, fill=fill,
+    )
+    return bg
+
+
 def _render_style_branded_block(
     settings: dict[str, object],
     target_width: int,
@@ -178,9 +225,7 @@ def _render_style_branded_block(
     font_size = max(12, int(target_width * 0.12))
     font = get_font(font_path, font_size)
 
-    dummy = Image.new("RGBA", (1, 1))
-    dd = ImageDraw.Draw(dummy)
-    bbox = dd.textbbox((0, 0), text, font=font)
+    bbox = _text_bbox(font, text)
     text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
 
     icon_size = int(text_h * 1.2)
@@ -196,15 +241,9 @@ def _render_style_branded_block(
     wm_w = content_w + pad_w * 2
     wm_h = content_h + pad_h * 2
 
-    wm_img = Image.new("RGBA", (wm_w, wm_h), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(wm_img)
-
     bg_color = (0, 0, 0, 153) if color == "light" else (255, 255, 255, 153)
-    draw.rounded_rectangle(
-        [0, 0, wm_w - 1, wm_h - 1],
-        radius=border_radius,
-        fill=bg_color,
-    )
+    wm_img = _rounded_bg(wm_w, wm_h, border_radius, bg_color).copy()
+    draw = ImageDraw.Draw(wm_img)
 
     brand = _detect_brand(text)
     icon = _create_brand_icon(brand, icon_size)
@@ -225,55 +264,136 @@ STYLE_RENDERERS = {
     "branded_block": _render_style_branded_block,
 }
 
+@lru_cache(maxsize=128)
+def _alpha_lut(opacity: float) -> tuple[int, ...]:
+    """256-entry alpha scaling table, built once per opacity.
 
-def apply_watermark(
-    image: Image.Image,
+    A prebuilt table goes straight to PIL's C lookup path in point().
+    """
+    return tuple(int(p * opacity) for p in range(256))
+
+
+# Watermark widths are rounded to this many pixels so a batch of images
+# with slightly different sizes reuses one rendered element. Misses render
+# directly: downscaling one canonical 1024px render per width measured
+# 2-6x slower than rendering at the target size (fonts/icons are cached),
+# and would also break the 12px minimum font size at small widths.
+WM_WIDTH_BUCKET: int = 8
+
+
+@lru_cache(maxsize=64)
+def _cached_wm_element(
+    style_key: str,
+    target_width: int,
+    color: str,
+    text: str,
+    opacity: float,
+    font_path: Optional[str],
+) -> Image.Image:
+    """Render a watermark element with its final opacity, once per key.
+
+    The returned image is shared with the cache: callers must not modify
+    it in place (pasting it, as apply_watermark does, is fine).
+    """
+    renderer = STYLE_RENDERERS.get(style_key, _render_style_branded_block)
+    wm_element = renderer({"custom_text": text, "color": color}, target_width, font_path)
+
+    if opacity < 1.0:
+        wm_element.putalpha(wm_element.getchannel("A").point(_alpha_lut(opacity)))
+    return wm_element
+
+
+def _setting_str(settings: dict[str, object], key: str, default: str) -> str:
+    """Read a string setting that may also be a str-Enum member."""
+    value = settings.get(key, default)
+    return value.value if hasattr(value, "value") else str(value)
+
+
+def watermark_element(
     settings: dict[str, object],
-    face_bboxes: list[object] | None = None,
+    image_width: int,
     font_path: Optional[str] = None,
-) -> tuple[Image.Image, str, float, list[float]]:
-    """Apply watermark to a copy of the image."""
-    result_image = image.convert("RGBA")
-    original_width, original_height = result_image.size
+) -> Image.Image:
+    """Rendered watermark element for an image of the given width.
+
+    Every step behind this is memoized: the element per (style, bucketed
+    width, color, text, opacity, font), and below it fonts, text boxes,
+    icons and backgrounds per size. A batch therefore does the FreeType
+    work once per distinct font size on its first image, with no separate
+    precomputed table. Shared with the cache: do not modify the result.
+    """
+    custom_pct = settings.get("custom_size_pct")
+    if custom_pct is not None:
+        target_width = int(image_width * float(custom_pct))
+    else:
+        multiplier = SIZE_MULTIPLIERS.get(_setting_str(settings, "size", "M"), 0.12)
+        target_width = int(image_width * multiplier)
 
-    # PERFORMANCE: Downscale high-res images for faster zone analysis
-    # No need for full resolution to detect standard deviations
+    target_width = max(
+        WM_WIDTH_BUCKET,
+        (target_width + WM_WIDTH_BUCKET // 2) // WM_WIDTH_BUCKET * WM_WIDTH_BUCKET,
+    )
+    return _cached_wm_element(
+        _setting_str(settings, "style", "branded_block"),
+        target_width,
+        _setting_str(settings, "color", "light"),
+        str(settings.get("custom_text", "patreon.com/Ninyra")),
+        round(float(settings.get("opacity", 0.75)), 3),
+        font_path,
+    )
+
+
+def _analysis_grayscale(image: Image.Image) -> NDArray[np.uint8]:
+    """Luminance array for zone detection, downscaled for large images.
+
+    No need for full resolution to detect standard deviations, and zone
+    detection only reads luminance, so no RGB(A) copy is made here;
+    nearest-neighbour sampling first means only the small image is converted.
+    """
+    width, height = image.size
     max_dim = 1024
-    if original_width > max_dim or original_height > max_dim:
-        scale = max_dim / max(original_width, original_height)
-        new_size = (int(original_width * scale), int(original_height * scale))
+    if width > max_dim or height > max_dim:
+        scale = max_dim / max(width, height)
+        new_size = (int(width * scale), int(height * scale))
         # Use simpler interpolation for speed
-        grayscale_small = result_image.convert("L").resize(new_size, Image.Resampling.NEAREST)
-        grayscale = np.array(grayscale_small)
-        # These are used for zone placement math
-        analysis_height, analysis_width = grayscale.shape
-    else:
-        grayscale = np.array(result_image.convert("L"))
-        analysis_height, analysis_width = grayscale.shape
+        image = image.resize(new_size, Image.Resampling.NEAREST)
+    return np.asarray(image.convert("L"))
 
-    # Determine watermark width based on ORIGINAL dimensions
-    custom_pct = settings.get("custom_size_pct")
-    if custom_pct is not None:
-        target_width = int(original_width * float(custom_pct))
-    else:
-        size_key = str(settings.get("size", "M"))
-        multiplier = SIZE_MULTIPLIERS.get(size_key, 0.12)
-        target_width = int(original_width * multiplier)
-
-    # Render watermark element
-    style = settings.get("style", "branded_block")
-    # Handle both string and Enum members
-    style_key = style.value if hasattr(style, "value") else str(style)
-    
-    renderer = STYLE_RENDERERS.get(style_key, _render_style_branded_block)
-    wm_element = renderer(settings, target_width, font_path)
 
-    # Apply opacity
-    opacity = float(settings.get("opacity", 0.75))
-    if opacity < 1.0:
-        alpha = wm_element.split()[3]
-        alpha = alpha.point(lambda p: int(p * opacity))
-        wm_element.putalpha(alpha)
+def apply_watermark(
+    image: Image.Image,
+    settings: dict[str, object],
+    face_bboxes: list[object] | None = None,
+    font_path: Optional[str] = None,
+    keep_alpha: bool = True,
+    in_place: bool = False,
+) -> tuple[Image.Image, str, float, tuple[float, ...]]:
+    """Apply watermark to a copy of the image.
+
+    Pass ``keep_alpha=False`` when the result is encoded without alpha
+    (JPEG): RGBA inputs are then flattened onto the JPEG background colour
+    and the watermark is composited straight onto that RGB copy.
+    With ``in_place`` the caller owns ``image`` (e.g. a fresh decode that is
+    not shared with the base64 cache) and, if it is already in the output
+    mode, the watermark is pasted into it without a full-image copy.
+    At (near) zero opacity nothing is drawn and rendering is skipped.
+    """
+    original_width, original_height = image.size
+    out_mode = "RGBA" if keep_alpha and image.mode == "RGBA" else "RGB"
+
+    # An invisible watermark changes nothing: skip rendering and placement
+    if float(settings.get("opacity", 0.75)) <= 0.005:
+        if image.mode == out_mode:
+            # ``image`` may be shared with the base64 decode cache
+            result = image if in_place else image.copy()
+        elif image.mode == "RGBA":
+            result = flatten_alpha(image)
+        else:
+            result = image.convert(out_mode)
+        return result, "none", 0.0, ()
+
+    # Watermark width is based on ORIGINAL dimensions
+    wm_element = watermark_element(settings, original_width, font_path)
 
     wm_w, wm_h = wm_element.size
     padding = int(settings.get("padding", 20))
@@ -291,11 +411,11 @@ def apply_watermark(
         py = max(0, min(py, original_height - wm_h))
         zone_name = "manual"
         zone_score = 1.0
-        all_scores: list[float] = []
+        all_scores: tuple[float, ...] = ()
     else:
-        # Smart zone detection (uses downscaled analysis_width if needed)
+        # Smart zone detection (on a downscaled luminance image if needed)
         zone_result = detect_best_zone(
-            grayscale, # Pass the already prepared grayscale (possibly downscaled)
+            _analysis_grayscale(image),
             watermark_width=wm_w,
             watermark_height=wm_h,
             padding=padding,
@@ -307,30 +427,48 @@ def apply_watermark(
         zone_score = zone_result.score
         all_scores = zone_result.all_scores
 
-    # Paste watermark
+    # Paste watermark onto a working copy (or the caller-owned image when
+    # in_place allows it); opaque inputs never go through RGBA.
+    # PIL's masked paste is already a C alpha-over limited to the tile and
+    # rounds exactly like (wm*a + bg*(255-a) + 127) // 255; a numba tile
+    # kernel measured no faster, and crop/paste-back made it ~4x slower.
+    if in_place and image.mode == out_mode:
+        result_image = image
+    elif image.mode == "RGBA" and out_mode == "RGB":
+        result_image = flatten_alpha(image)
+    else:
+        result_image = image.convert(out_mode)
     result_image.paste(wm_element, (px, py), wm_element)
 
-    if image.mode != "RGBA":
-        result_image = result_image.convert("RGB")
-
     return result_image, zone_name, zone_score, all_scores
 
 
 def process_single_image(
-    image_base64: str,
+    image_base64: str | bytes,
     settings: dict[str, object],
     original_name: str = "image.png",
     face_bboxes: list[object] | None = None,
     font_path: Optional[str] = None,
     embed_invisible: bool = False,
     preview: bool = False,
+    raw_bytes: bool = False,
+    compress_level: int = PNG_COMPRESS_LEVEL,
 ) -> dict[str, object]:
-    """Process a single image: decode, apply watermark, return result dict."""
-    image = base64_to_image(image_base64)
-    fmt = format_for_filename(original_name)
+    """Process a single image: decode, apply watermark, return result dict.
+
+    ``image_base64`` may also be the raw encoded file bytes (multipart upload).
+    With ``raw_bytes`` the encoded file is returned under "image_bytes"
+    instead of "image_base64". Previews are encoded as WebP when available;
+    "mimetype" in the result tells which format was used.
+    """
+    image = decode_image(image_base64)
+    fmt = preview_format(original_name) if preview else format_for_filename(original_name)
 
     result_image, zone_name, zone_score, _ = apply_watermark(
-        image, settings, face_bboxes=face_bboxes, font_path=font_path
+        image, settings, face_bboxes=face_bboxes, font_path=font_path,
+        keep_alpha=fmt != "JPEG",
+        # Raw bytes decode to a private image; base64 decodes are cached/shared
+        in_place=isinstance(image_base64, bytes),
     )
 
     # Embed invisible watermark ONLY on final export (not preview)
@@ -339,11 +477,30 @@ def process_single_image(
         if is_available():
             result_image = embed_watermark(result_image)
 
-    result_base64 = image_to_base64(result_image, fmt)
+    if raw_bytes:
+        encoded: dict[str, object] = {
+            "image_bytes": image_to_bytes(result_image, fmt, compress_level),
+        }
+    else:
+        encoded = {"image_base64": image_to_base64(result_image, fmt, compress_level)}
 
     return {
-        "image_base64": result_base64,
+        **encoded,
+        "mimetype": mimetype_for_format(fmt),
         "zone_used": zone_name,
         "zone_score": zone_score,
         "original_name": original_name,
     }
+
+
+def init_render_worker(log_queue: Optional[multiprocessing.queues.Queue] = None) -> None:
+    """Process-pool initializer: load the optional steganography stack up front.
+
+    Lives here rather than in main.py so spawned workers only import the
+    render modules, not the API app and its logging setup. Log records go
+    to ``log_queue`` so the parent writes them to its own log file.
+    """
+    if log_queue is not None:
+        from backend.log_setup import setup_worker_logging
+        setup_worker_logging(log_queue)
+    from backend import steganography  # noqa: F401
@@ -5,7 +5,7 @@ All types used across backend modules are defined here.
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from enum import Enum
 from typing import Literal
 
@@ -38,7 +38,7 @@ SIZE_MULTIPLIERS: dict[WatermarkSize, float] = {
 }
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WatermarkSettings:
     """Complete settings for watermark rendering."""
     style: WatermarkStyle = WatermarkStyle.BRANDED_BLOCK
@@ -65,7 +65,7 @@ class WatermarkSettings:
             object.__setattr__(self, "custom_size_pct", clamped)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ZoneResult:
     """Result of zone detection analysis."""
     zone_index: int
@@ -73,10 +73,10 @@ class ZoneResult:
     x: int
     y: int
     score: float
-    all_scores: list[float] = field(default_factory=list)
+    all_scores: tuple[float, ...] = ()
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ProcessResult:
     """Result of processing a single image."""
     image_base64: str
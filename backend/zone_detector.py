@@ -11,8 +11,9 @@ Supports face bbox exclusion zones from AI detection.
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass, field
+from functools import lru_cache
 
+import cv2
 import numpy as np
 from numpy.typing import NDArray
 
@@ -21,75 +22,106 @@ from backend.config import (
     MIN_DIMENSION,
     FALLBACK_ZONE_INDEX,
     ZONE_NAMES,
-    FACE_FALLBACK_OPACITY,
+    ZONE_SAMPLE_MIN_SIDE,
 )
+from backend.wm_types import ZoneResult
 
 logger = logging.getLogger("ninyrawatermark.zone_detector")
 
+# Face boxes as objects with x_min/y_min/x_max/y_max, or as the int32
+# column tuple produced by ai_detection.face_columns
+FaceBoxes = list[object] | tuple[NDArray[np.int32], ...]
 
-@dataclass(frozen=True)
-class ZoneResult:
-    """Result of zone detection analysis."""
-    zone_index: int
-    zone_name: str
-    x: int
-    y: int
-    score: float
-    all_scores: list[float] = field(default_factory=list)
 
+def _luminance(rgb: NDArray[np.uint8]) -> NDArray[np.uint8]:
+    """Integer BT.601 luma of an (H, W, 3|4) image; alpha is ignored."""
+    code = cv2.COLOR_RGBA2GRAY if rgb.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+    return cv2.cvtColor(rgb, code)
 
-def _compute_zone_std_deviations(grayscale: NDArray[np.uint8]) -> list[float]:
-    """Divide grayscale image into 3x3 grid, compute std deviation per zone."""
-    height, width = grayscale.shape
+
+def _compute_zone_std_deviations(image: NDArray[np.uint8]) -> tuple[float, ...]:
+    """Divide image into 3x3 grid, compute luma std deviation per zone.
+
+    Accepts 2D grayscale or 3D RGB/RGBA. The last row/column of zones
+    absorbs the remainder pixels.
+    """
+    height, width = image.shape[:2]
     row_step = height // 3
     col_step = width // 3
+    if row_step == 0 or col_step == 0:
+        return (0.0,) * 9
+
+    grayscale = _luminance(image) if image.ndim == 3 else image
+    row_bounds = (0, row_step, 2 * row_step, height)
+    col_bounds = (0, col_step, 2 * col_step, width)
+    return tuple(
+        float(cv2.meanStdDev(grayscale[
+            row_bounds[row]:row_bounds[row + 1],
+            col_bounds[col]:col_bounds[col + 1],
+        ])[1][0, 0])
+        for row in range(3)
+        for col in range(3)
+    )
 
-    std_devs: list[float] = []
-    for row in range(3):
-        for col in range(3):
-            y_start = row * row_step
-            y_end = (row + 1) * row_step if row < 2 else height
-            x_start = col * col_step
-            x_end = (col + 1) * col_step if col < 2 else width
 
-            zone_pixels = grayscale[y_start:y_end, x_start:x_end]
-            std_devs.append(float(np.std(zone_pixels)))
+# Normalized (x1, y1, x2, y2) bounds of the 3x3 grid zones
+_ZONE_BOUNDS: NDArray[np.float64] = np.array([
+    (col / 3.0, row / 3.0, (col + 1) / 3.0, (row + 1) / 3.0)
+    for row in range(3)
+    for col in range(3)
+])
 
-    return std_devs
 
+def _face_array(face_bboxes: FaceBoxes) -> NDArray[np.float64]:
+    """(F, 4) array of x_min, y_min, x_max, y_max, built once per call.
 
-def _zone_overlaps_faces(
-    zone_index: int,
-    face_bboxes: list[object],
-    orig_w: int,
-    orig_h: int,
-) -> bool:
-    """Check if a 3x3 grid zone overlaps any face bounding box."""
-    if not face_bboxes:
-        return False
-
-    row = zone_index // 3
-    col = zone_index % 3
-    col_w = 1.0 / 3.0
-    row_h = 1.0 / 3.0
+    Accepts bbox objects or the int32 columns from
+    ai_detection.face_columns, which skip the per-face attribute lookups.
+    """
+    if isinstance(face_bboxes, tuple):
+        return np.column_stack(face_bboxes).astype(np.float64).reshape(-1, 4)
+    return np.array(
+        [
+            (
+                getattr(face, "x_min", 0), getattr(face, "y_min", 0),
+                getattr(face, "x_max", 0), getattr(face, "y_max", 0),
+            )
+            for face in face_bboxes
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 4)
 
-    # Normalized zone bounds
-    zx1 = col * col_w
-    zy1 = row * row_h
-    zx2 = (col + 1) * col_w
-    zy2 = (row + 1) * row_h
 
-    for face in face_bboxes:
-        # Normalize face to 0..1
-        fx1 = getattr(face, "x_min", 0) / orig_w
-        fy1 = getattr(face, "y_min", 0) / orig_h
-        fx2 = getattr(face, "x_max", 0) / orig_w
-        fy2 = getattr(face, "y_max", 0) / orig_h
+def _zones_overlapping_faces(
+    face_bboxes: FaceBoxes,
+    orig_w: int,
+    orig_h: int,
+) -> NDArray[np.bool_]:
+    """Mask of the 9 grid zones that overlap any face bounding box.
+
+    All zones are tested against all faces in one broadcast comparison.
+    """
+    faces = _face_array(face_bboxes)
+    faces /= (orig_w, orig_h, orig_w, orig_h)
+
+    zones = _ZONE_BOUNDS[:, None, :]
+    overlap = (
+        (zones[..., 0] < faces[:, 2]) & (zones[..., 2] > faces[:, 0])
+        & (zones[..., 1] < faces[:, 3]) & (zones[..., 3] > faces[:, 1])
+    )
+    return overlap.any(axis=1)
 
-        if zx1 < fx2 and zx2 > fx1 and zy1 < fy2 and zy2 > fy1:
-            return True
 
-    return False
+@lru_cache(maxsize=64)
+def _zone_centers(
+    image_width: int, image_height: int,
+) -> tuple[tuple[int, int], ...]:
+    """Center (x, y) of each 3x3 grid zone, the last row/column absorbing remainders."""
+    col_w = image_width // 3
+    row_h = image_height // 3
+    xs = (col_w // 2, (3 * col_w) // 2, (2 * col_w + image_width) // 2)
+    ys = (row_h // 2, (3 * row_h) // 2, (2 * row_h + image_height) // 2)
+    return tuple((x, y) for y in ys for x in xs)
 
 
 def _calculate_placement_coords(
@@ -101,19 +133,7 @@ def _calculate_placement_coords(
     padding: int,
 ) -> tuple[int, int]:
     """Calculate top-left (x, y) for watermark within the specified zone."""
-    row = zone_index // 3
-    col = zone_index % 3
-
-    col_w = image_width // 3
-    row_h = image_height // 3
-
-    zone_x_start = col * col_w
-    zone_y_start = row * row_h
-    zone_x_end = (col + 1) * col_w if col < 2 else image_width
-    zone_y_end = (row + 1) * row_h if row < 2 else image_height
-
-    center_x = (zone_x_start + zone_x_end) // 2
-    center_y = (zone_y_start + zone_y_end) // 2
+    center_x, center_y = _zone_centers(image_width, image_height)[zone_index]
 
     x = center_x - watermark_width // 2
     y = center_y - watermark_height // 2
@@ -129,28 +149,12 @@ def detect_best_zone(
     watermark_width: int = 0,
     watermark_height: int = 0,
     padding: int = 20,
-    face_bboxes: list[object] | None = None,
+    face_bboxes: FaceBoxes | None = None,
     original_dims: tuple[int, int] | None = None,
 ) -> ZoneResult:
     """Analyze image and determine best zone for watermark placement."""
     # Input can be 2D grayscale or 3D RGB/RGBA
-    if len(image_input.shape) == 2:
-        grayscale = image_input
-    elif len(image_input.shape) == 3:
-        if image_input.shape[2] == 4:
-            grayscale = np.dot(
-                image_input[:, :, :3].astype(np.float64),
-                [0.299, 0.587, 0.114],
-            ).astype(np.uint8)
-        else:
-            grayscale = np.dot(
-                image_input.astype(np.float64),
-                [0.299, 0.587, 0.114],
-            ).astype(np.uint8)
-    else:
-        grayscale = image_input
-
-    height, width = grayscale.shape
+    height, width = image_input.shape[:2]
     orig_w, orig_h = original_dims if original_dims else (width, height)
 
     # Small image fallback
@@ -163,18 +167,19 @@ def detect_best_zone(
             zone_index=FALLBACK_ZONE_INDEX,
             zone_name=ZONE_NAMES[FALLBACK_ZONE_INDEX],
             x=x, y=y, score=0.0,
-            all_scores=[0.0] * 9,
+            all_scores=(0.0,) * 9,
         )
 
-    all_scores = _compute_zone_std_deviations(grayscale)
+    # Strided view (no copy): std deviation is stable on a sparse sample,
+    # placement below still uses the full dimensions
+    step = max(1, min(height, width) // ZONE_SAMPLE_MIN_SIDE)
+    all_scores = _compute_zone_std_deviations(image_input[::step, ::step])
 
     # Exclude center zone (index 4) and face-overlapping zones
     candidate_indices = [i for i in range(9) if i != 4]
     if face_bboxes:
-        non_face_indices = [
-            i for i in candidate_indices
-            if not _zone_overlaps_faces(i, face_bboxes, orig_w, orig_h)
-        ]
+        face_zones = _zones_overlapping_faces(face_bboxes, orig_w, orig_h).tolist()
+        non_face_indices = [i for i in candidate_indices if not face_zones[i]]
         if non_face_indices:
             candidate_indices = non_face_indices
         else:
@@ -192,15 +197,14 @@ def detect_best_zone(
                 all_scores=all_scores,
             )
 
-    candidate_scores = [(i, all_scores[i]) for i in candidate_indices]
-    scores_only = [s for _, s in candidate_scores]
-    score_spread = max(scores_only) - min(scores_only)
+    # Nine floats: plain min/max beat an ndarray round-trip here
+    candidate_scores = [all_scores[i] for i in candidate_indices]
 
-    if score_spread < SIMILARITY_THRESHOLD:
+    if max(candidate_scores) - min(candidate_scores) < SIMILARITY_THRESHOLD:
         best_index = FALLBACK_ZONE_INDEX
-        best_score = all_scores[FALLBACK_ZONE_INDEX]
     else:
-        best_index, best_score = min(candidate_scores, key=lambda item: item[1])
+        best_index = min(candidate_indices, key=all_scores.__getitem__)
+    best_score = all_scores[best_index]
 
     x, y = _calculate_placement_coords(
         best_index, orig_w, orig_h,
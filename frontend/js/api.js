@@ -9,9 +9,9 @@ const api = (() => {
   const API_BASE = '/api';
 
   /**
-   * Make a JSON API request and return parsed response.
+   * Make an API request and return the raw Response, throwing on errors.
    */
-  async function _request(endpoint, options = {}) {
+  async function _fetch(endpoint, options = {}) {
     const url = `${API_BASE}${endpoint}`;
     const config = {
       headers: { 'Content-Type': 'application/json' },
@@ -31,9 +31,45 @@ const api = (() => {
       throw new Error(detail);
     }
 
+    return response;
+  }
+
+  /**
+   * Make a JSON API request and return parsed response.
+   */
+  async function _request(endpoint, options = {}) {
+    const response = await _fetch(endpoint, options);
     return response.json();
   }
 
+  /**
+   * POST an image plus fields. A File/Blob image is sent as multipart
+   * form data (raw bytes, no base64); a base64 string is sent as JSON.
+   * Object-valued fields are JSON-encoded inside the form.
+   * Returns parsed JSON, or the raw Response when `raw` is true.
+   */
+  async function _requestImage(endpoint, image, fields = {}, raw = false) {
+    const send = raw ? _fetch : _request;
+    if (!(image instanceof Blob)) {
+      return send(endpoint, {
+        method: 'POST',
+        body: JSON.stringify({ image, ...fields }),
+      });
+    }
+
+    const formData = new FormData();
+    formData.append('image', image);
+    for (const [key, value] of Object.entries(fields)) {
+      if (value === undefined || value === null) continue;
+      formData.append(key, typeof value === 'string' ? value : JSON.stringify(value));
+    }
+    return send(endpoint, {
+      method: 'POST',
+      headers: {},
+      body: formData,
+    });
+  }
+
   /**
    * Health check — returns true if backend is online.
    */
@@ -49,42 +85,65 @@ const api = (() => {
 
   /**
    * Send image for preview processing.
+   * `image` is a File/Blob (preferred) or a base64 string.
    */
-  async function preview(imageBase64, settings, name, faceBboxes, fontPath) {
-    const body = {
-      image: imageBase64,
-      settings,
-      name,
-    };
+  async function preview(image, settings, name, faceBboxes, fontPath, facesId) {
+    const fields = { settings, name };
     if (faceBboxes && faceBboxes.length > 0) {
-      body.face_bboxes = faceBboxes;
+      fields.face_bboxes = faceBboxes;
+    }
+    if (facesId) {
+      fields.faces_id = facesId;
     }
     if (fontPath) {
-      body.font_path = fontPath;
+      fields.font_path = fontPath;
     }
-    return _request('/preview', {
-      method: 'POST',
-      body: JSON.stringify(body),
-    });
+    return _requestImage('/preview', image, fields);
   }
 
   /**
    * Export image with optional invisible watermark.
+   * `image` is a File/Blob (preferred) or a base64 string.
+   * Resolves to { blob, zoneUsed, zoneScore } — the file is streamed raw.
    */
-  async function exportImage(imageBase64, settings, name, embedInvisible, faceBboxes, fontPath) {
-    const body = {
-      image: imageBase64,
+  async function exportImage(image, settings, name, embedInvisible, faceBboxes, fontPath, facesId) {
+    const fields = {
       settings,
       name,
       embed_invisible: embedInvisible,
     };
     if (faceBboxes && faceBboxes.length > 0) {
-      body.face_bboxes = faceBboxes;
+      fields.face_bboxes = faceBboxes;
+    }
+    if (facesId) {
+      fields.faces_id = facesId;
     }
+    if (fontPath) {
+      fields.font_path = fontPath;
+    }
+    const response = await _requestImage('/export', image, fields, true);
+    const zoneScore = response.headers.get('X-Zone-Score');
+    return {
+      blob: await response.blob(),
+      zoneUsed: response.headers.get('X-Zone-Used'),
+      zoneScore: zoneScore === null ? null : parseFloat(zoneScore),
+    };
+  }
+
+  /**
+   * Export several base64 images in one request (processed in parallel).
+   * `images` is an array of { image, name } objects.
+   */
+  async function exportBatch(images, settings, embedInvisible, fontPath) {
+    const body = {
+      images,
+      settings,
+      embed_invisible: embedInvisible,
+    };
     if (fontPath) {
       body.font_path = fontPath;
     }
-    return _request('/export', {
+    return _request('/export/batch', {
       method: 'POST',
       body: JSON.stringify(body),
     });
@@ -120,20 +179,24 @@ const api = (() => {
   /**
    * Verify invisible watermark in an image.
    */
-  async function verifyWatermark(imageBase64) {
-    return _request('/verify', {
-      method: 'POST',
-      body: JSON.stringify({ image: imageBase64 }),
-    });
+  async function verifyWatermark(image) {
+    return _requestImage('/verify', image);
   }
 
   /**
    * Run face detection on an image.
    */
-  async function detectFaces(imageBase64) {
-    return _request('/detect-faces', {
+  async function detectFaces(image) {
+    return _requestImage('/detect-faces', image);
+  }
+
+  /**
+   * Run face detection on several images in one request.
+   */
+  async function detectFacesBatch(imagesBase64) {
+    return _request('/detect-faces/batch', {
       method: 'POST',
-      body: JSON.stringify({ image: imageBase64 }),
+      body: JSON.stringify({ images: imagesBase64 }),
     });
   }
 
@@ -184,10 +247,12 @@ const api = (() => {
     healthCheck,
     preview,
     exportImage,
+    exportBatch,
     uploadFont,
     listFonts,
     verifyWatermark,
     detectFaces,
+    detectFacesBatch,
     getConfig,
     setConfig,
     getPresets,
@@ -144,25 +144,29 @@
         const batchPromises = batch.map(async (img) => {
           const facesData = upload.getCachedFaces(img.id);
           const faceBboxes = facesData ? facesData.faces : null;
+          const facesId = facesData ? facesData.facesId : null;
           const fontPath = currentSettings.font_path;
 
           const res = await api.preview(
-            img.base64,
+            img.file,
             currentSettings,
             img.name,
             faceBboxes,
             fontPath,
+            facesId,
           );
 
           if (res.success) {
-            const mime = preview.getMimeForFilename(img.name);
+            const mime = res.data.mimetype || preview.getMimeForFilename(img.name);
             return {
               id: img.id,
               name: img.name,
+              originalFile: img.file,
               originalBase64: img.base64,
               originalPreview: img.preview,
               resultBase64: res.data.result,
               resultPreview: `data:${mime};base64,${res.data.result}`,
+              resultMime: mime,
               zoneUsed: res.data.zone_used,
               zoneScore: res.data.zone_score,
             };
@@ -210,25 +214,29 @@
     const currentSettings = settings.getCurrent();
     const facesData = upload.getCachedFaces(img.id);
     const faceBboxes = facesData ? facesData.faces : null;
+    const facesId = facesData ? facesData.facesId : null;
 
     try {
       const res = await api.preview(
-        img.base64,
+        img.file,
         currentSettings,
         img.name,
         faceBboxes,
         currentSettings.font_path,
+        facesId,
       );
 
       if (res.success) {
-        const mime = preview.getMimeForFilename(img.name);
+        const mime = res.data.mimetype || preview.getMimeForFilename(img.name);
         const updatedItem = {
           id: img.id,
           name: img.name,
+          originalFile: img.file,
           originalBase64: img.base64,
           originalPreview: img.preview,
           resultBase64: res.data.result,
           resultPreview: `data:${mime};base64,${res.data.result}`,
+          resultMime: mime,
           zoneUsed: res.data.zone_used,
           zoneScore: res.data.zone_score,
         };
@@ -244,11 +252,12 @@
    */
   async function _runFaceDetection(img) {
     try {
-      const res = await api.detectFaces(img.base64);
+      const res = await api.detectFaces(img.file);
       if (res.success) {
         upload.cacheFaces(img.id, {
           faces: res.data.faces,
           exclusionZones: res.data.exclusion_zones,
+          facesId: res.data.faces_id,
         });
 
         if (showFacesEnabled && res.data.exclusion_zones) {
@@ -329,21 +338,16 @@
       const file = e.target.files[0];
       if (!file) return;
       try {
-        const reader = new FileReader();
-        reader.onload = async () => {
-          const base64 = reader.result.split(',')[1];
-          const res = await api.verifyWatermark(base64);
-          if (res.success) {
-            if (res.data.found) {
-              ui.showToast(`Watermark found: "${res.data.watermark_string}"`, 'success');
-            } else {
-              ui.showToast(res.data.message || 'No watermark detected.', 'error');
-            }
+        const res = await api.verifyWatermark(file);
+        if (res.success) {
+          if (res.data.found) {
+            ui.showToast(`Watermark found: "${res.data.watermark_string}"`, 'success');
           } else {
-            ui.showToast(res.error || 'Verification failed', 'error');
+            ui.showToast(res.data.message || 'No watermark detected.', 'error');
           }
-        };
-        reader.readAsDataURL(file);
+        } else {
+          ui.showToast(res.error || 'Verification failed', 'error');
+        }
       } catch (err) {
         ui.showToast(err.message || 'Verification failed', 'error');
       }
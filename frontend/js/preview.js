@@ -18,7 +18,7 @@
 const preview = (() => {
   'use strict';
 
-  /** @type {Array<{id, name, originalPreview, resultBase64, resultPreview, zoneUsed, zoneScore}>} */
+  /** @type {Array<{id, name, originalPreview, resultBase64, resultPreview, resultMime, zoneUsed, zoneScore}>} */
   let processedImages = [];
   let selectedIndex = 0;
   let showingOriginal = false;
@@ -297,8 +297,12 @@ const preview = (() => {
           for (let i = 0; i < processedImages.length; i += BATCH_SIZE) {
             const batch = processedImages.slice(i, i + BATCH_SIZE);
             const results = await Promise.all(batch.map(img => _exportImageForZip(img)));
-            for (const { fileName, base64 } of results) {
-              zip.file(fileName, base64, { base64: true });
+            for (const { fileName, blob, base64 } of results) {
+              if (blob) {
+                zip.file(fileName, blob);
+              } else {
+                zip.file(fileName, base64, { base64: true });
+              }
             }
           }
           const blob = await zip.generateAsync({ type: 'blob' });
@@ -501,7 +505,9 @@ const preview = (() => {
     const baseName = item.name.substring(0, item.name.lastIndexOf('.')) || item.name;
     const fileName = `watermarked_${baseName}.${ext}`;
 
-    let dataUrl = item.resultPreview;
+    let href = item.resultPreview;
+    let downloadName = _previewFileName(item, fileName);
+    let objectUrl = null;
 
     try {
       const ninyra = window.__ninyra || {};
@@ -510,36 +516,41 @@ const preview = (() => {
       const uploadModule = ninyra.getUpload ? ninyra.getUpload() : null;
       const facesData = uploadModule ? uploadModule.getCachedFaces(item.id) : null;
       const faceBboxes = facesData ? facesData.faces : null;
+      const facesId = facesData ? facesData.facesId : null;
 
-      const originalBase64 = item.originalBase64 || item.resultBase64;
+      const original = item.originalFile || item.originalBase64 || item.resultBase64;
 
       const res = await api.exportImage(
-        originalBase64,
+        original,
         currentSettings,
         item.name,
         embedInvisible,
         faceBboxes,
         currentSettings.font_path,
+        facesId,
       );
 
-      if (res.success && res.data && res.data.result) {
-        const mime = getMimeForFilename(item.name);
-        dataUrl = `data:${mime};base64,${res.data.result}`;
-      }
+      objectUrl = URL.createObjectURL(res.blob);
+      href = objectUrl;
+      downloadName = fileName;
     } catch (err) {
       console.warn('Export API failed, falling back to preview data:', err);
     }
 
     const link = document.createElement('a');
-    link.href = dataUrl;
-    link.download = fileName;
+    link.href = href;
+    link.download = downloadName;
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
+    if (objectUrl) {
+      setTimeout(() => URL.revokeObjectURL(objectUrl), 0);
+    }
   }
 
   /**
-   * Export a single image and return its base64 result (for ZIP bundling).
+   * Export a single image and return its file blob (for ZIP bundling).
+   * Falls back to the preview's base64 result if the export fails.
    */
   async function _exportImageForZip(item) {
     const ext = item.name.split('.').pop() || 'png';
@@ -553,26 +564,34 @@ const preview = (() => {
       const uploadModule = ninyra.getUpload ? ninyra.getUpload() : null;
       const facesData = uploadModule ? uploadModule.getCachedFaces(item.id) : null;
       const faceBboxes = facesData ? facesData.faces : null;
+      const facesId = facesData ? facesData.facesId : null;
 
-      const originalBase64 = item.originalBase64 || item.resultBase64;
+      const original = item.originalFile || item.originalBase64 || item.resultBase64;
 
       const res = await api.exportImage(
-        originalBase64,
+        original,
         currentSettings,
         item.name,
         embedInvisible,
         faceBboxes,
         currentSettings.font_path,
+        facesId,
       );
 
-      if (res.success && res.data && res.data.result) {
-        return { fileName, base64: res.data.result };
-      }
+      return { fileName, blob: res.blob };
     } catch (err) {
       console.warn('Export failed for', item.name, ':', err);
     }
 
-    return { fileName, base64: item.resultBase64 };
+    return { fileName: _previewFileName(item, fileName), base64: item.resultBase64 };
+  }
+
+  /**
+   * File name for the preview fallback — previews may be WebP-encoded.
+   */
+  function _previewFileName(item, fileName) {
+    if (item.resultMime !== 'image/webp') return fileName;
+    return fileName.replace(/\.[^.]*$/, '') + '.webp';
   }
 
   /**
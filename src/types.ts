@@ -55,8 +55,14 @@ export interface BatchResultItem {
   zone_score: number;
 }
 
+export interface BatchErrorItem {
+  name: string;
+  error: string;
+}
+
 export interface BatchResponse {
   results: BatchResultItem[];
+  errors: BatchErrorItem[];
 }
 
 export interface Preset {
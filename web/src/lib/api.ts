@@ -8,6 +8,8 @@ import type {
   WatermarkSettings,
   SingleResponse,
   BatchResponse,
+  BatchResultItem,
+  BatchErrorItem,
   PresetsMap,
 } from "@/types";
 
@@ -51,10 +53,10 @@ class ApiError extends Error {
   }
 }
 
-async function apiRequest<T>(
+async function apiFetch(
   endpoint: string,
   options?: RequestInit
-): Promise<T> {
+): Promise<Response> {
   const base = getApiBase();
   const url = `${base}${endpoint}`;
   const response = await fetch(url, {
@@ -76,6 +78,14 @@ async function apiRequest<T>(
     throw new ApiError(detail, response.status);
   }
 
+  return response;
+}
+
+async function apiRequest<T>(
+  endpoint: string,
+  options?: RequestInit
+): Promise<T> {
+  const response = await apiFetch(endpoint, options);
   return response.json() as Promise<T>;
 }
 
@@ -105,14 +115,41 @@ export async function processSingle(
   });
 }
 
+/**
+ * The backend streams one NDJSON line per image as soon as it finishes;
+ * `onItem` sees each result (or per-image error) in completion order.
+ */
 export async function processBatch(
   images: { name: string; data: string }[],
-  settings: WatermarkSettings
+  settings: WatermarkSettings,
+  onItem?: (item: BatchResultItem | BatchErrorItem) => void
 ): Promise<BatchResponse> {
-  return apiRequest<BatchResponse>("/process/batch", {
+  const response = await apiFetch("/process/batch", {
     method: "POST",
     body: JSON.stringify({ images, settings }),
   });
+
+  const batch: BatchResponse = { results: [], errors: [] };
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const item = JSON.parse(line) as BatchResultItem | BatchErrorItem;
+    if ("error" in item) batch.errors.push(item);
+    else batch.results.push(item);
+    onItem?.(item);
+  };
+
+  const reader = response.body!.pipeThrough(new TextDecoderStream()).getReader();
+  let buffered = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffered += value;
+    const lines = buffered.split("\n");
+    buffered = lines.pop() ?? "";
+    lines.forEach(handleLine);
+  }
+  handleLine(buffered);
+  return batch;
 }
 
 export async function getPresets(): Promise<PresetsMap> {